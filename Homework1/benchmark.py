@@ -0,0 +1,229 @@
+"""Benchmarks for MyImage and image_operations.
+
+By default, runs the suite: every operation on synthetic square images of
+each size, reporting throughput in megapixels per second and the peak memory
+allocated while it runs. The results can be stored as a baseline and later
+runs compared against it, flagging operations that got slower.
+
+With --open-save, instead compares the per-pixel open/save path that MyImage
+used to take with the bulk tobytes/frombytes path, on every image in the
+images directory.
+
+Usage: python benchmark.py [--sizes N ...] [--packed] [--save-baseline FILE]
+                           [--baseline FILE] [--tolerance FRACTION]
+       python benchmark.py --open-save [image ...]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image
+from src.myimage import MyImage
+from src import image_operations
+
+
+IMAGES = 'images'
+MASKS = 'masks'
+REPEAT = 3
+# Sides of the synthetic square images, from 64^2 to 8K^2.
+SIZES = [64, 256, 1024, 4096, 8192]
+# Images with more pixels than this are timed once instead of REPEAT times.
+LARGE = 1 << 22
+# Pixels read and written by the get/set benchmark, at most.
+ACCESSES = 1 << 18
+
+
+def open_per_pixel(path: str) -> MyImage:
+    """Opens path the old way, setting one pixel at a time."""
+    img = Image.open(path)
+    myimg = MyImage(img.size)
+    img = img.convert('RGB')
+    for i, rgb in enumerate(list(img.getdata())):
+        myimg.pixels.set(i, rgb)
+    return myimg
+
+
+def save_per_pixel(myimg: MyImage, path: str) -> None:
+    """Saves myimg the old way, through a list of pixel tuples."""
+    img = Image.new("RGB", myimg.size)
+    img.putdata([rgb for rgb in myimg.pixels])
+    img.save(path)
+
+
+def best_time(fn, *args, repeat: int = REPEAT) -> float:
+    """Returns the best wall clock time, in seconds, of repeat calls."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_open_save(paths: [str]) -> None:
+    """Prints open and save timings of the old and new paths for paths."""
+    out = os.path.join(tempfile.mkdtemp(), 'out.png')
+    print(f'{"image":28} {"pixels":>9} {"open old":>9} {"open new":>9} '
+          f'{"packed":>9} {"save old":>9} {"save new":>9} {"packed":>9}')
+    for path in paths:
+        img = MyImage.open(path)
+        packed = MyImage.open(path, packed=True)
+        width, height = img.size
+        times = [best_time(open_per_pixel, path),
+                 best_time(MyImage.open, path),
+                 best_time(MyImage.open, path, True),
+                 best_time(save_per_pixel, img, out),
+                 best_time(img.save, out),
+                 best_time(packed.save, out)]
+        print(f'{os.path.basename(path):28} {width * height:>9} '
+              + ' '.join(f'{t * 1000:>7.1f}ms' for t in times))
+
+
+def synthetic_image(side: int, packed: bool = False, seed: int = 201) -> MyImage:
+    """Returns a side by side image of reproducible random pixels."""
+    myimg = MyImage((side, side), packed=packed)
+    myimg.pixels.frombytes(random.Random(seed).randbytes(3 * side * side))
+    return myimg
+
+
+def get_set(img: MyImage) -> None:
+    """Copies up to ACCESSES pixels of img onto themselves with get and set."""
+    width, height = img.size
+    rows = max(1, min(height, ACCESSES // width))
+    for r in range(rows):
+        for c in range(width):
+            img.set(r, c, img.get(r, c))
+
+
+def cases(side: int, packed: bool, directory: str) -> [(str, int, object, tuple)]:
+    """Returns the benchmarks for an image of side^2 pixels.
+
+    Each is a tuple of a name, the number of pixels it processes, the
+    function to time and its arguments.
+    """
+    img = synthetic_image(side, packed)
+    path = os.path.join(directory, f'{side}.png')
+    img.save(path)
+    pixels = side * side
+    accesses = min(pixels, side * max(1, ACCESSES // side))
+    benchmarks = [('open', pixels, MyImage.open, (path, packed)),
+                  ('save', pixels, img.save, (os.path.join(directory, 'out.png'),)),
+                  ('get/set', accesses, get_set, (img,)),
+                  ('remove_channel', pixels, image_operations.remove_channel, (img, False, False, True)),
+                  ('rotations', pixels, image_operations.rotations, (img,))]
+    for maskfile in sorted(glob.glob(os.path.join(MASKS, '*.txt'))):
+        name = os.path.splitext(os.path.basename(maskfile))[0]
+        benchmarks.append((f'apply_mask[{name}]', pixels, image_operations.apply_mask, (img, maskfile)))
+    benchmarks.append(('resize', pixels, image_operations.resize, (img,)))
+    return benchmarks
+
+
+def peak_memory(fn, *args) -> int:
+    """Returns the peak bytes allocated by Python while fn(*args) runs.
+
+    Measured in a separate run, as tracing slows the code down.
+    """
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes: [int], packed: bool = False) -> dict:
+    """Runs every benchmark on images of each size, printing results as they come.
+
+    Args:
+    - sizes: the sides of the square images
+    - packed: if True, images use packed storage
+
+    Returns:
+    a dict of the 'meta' data of the run and the 'results', which map
+    'name/side' to a dict of the 'mp_s' (megapixels per second), 'seconds'
+    and 'peak_mb' of the benchmark.
+    """
+    results = {}
+    print(f'{"benchmark":34} {"MP/s":>10} {"time":>10} {"peak MB":>9}')
+    with tempfile.TemporaryDirectory() as directory:
+        for side in sizes:
+            repeat = REPEAT if side * side <= LARGE else 1
+            for name, pixels, fn, args in cases(side, packed, directory):
+                seconds = best_time(fn, *args, repeat=repeat)
+                peak = peak_memory(fn, *args) / 2 ** 20
+                key = f'{name}/{side}'
+                results[key] = {'mp_s': pixels / 1e6 / seconds, 'seconds': seconds,
+                                'peak_mb': peak}
+                print(f'{key:34} {results[key]["mp_s"]:>10.2f} {seconds * 1000:>8.1f}ms '
+                      f'{peak:>9.1f}', flush=True)
+    meta = {'python': platform.python_version(), 'machine': platform.machine(),
+            'numpy': image_operations.np is not None, 'packed': packed}
+    return {'meta': meta, 'results': results}
+
+
+def compare(run: dict, baseline: dict, tolerance: float) -> [str]:
+    """Prints the throughput of run relative to baseline.
+
+    Args:
+    - run, baseline: results of run_suite()
+    - tolerance: the fraction of throughput that may be lost before a
+      benchmark counts as a regression
+
+    Returns:
+    the keys of the benchmarks that regressed.
+    """
+    if run['meta'] != baseline['meta']:
+        print(f'warning: baseline was run with {baseline["meta"]}, not {run["meta"]}')
+    regressions = []
+    print(f'{"benchmark":34} {"baseline":>10} {"now":>10} {"ratio":>7}')
+    for key, result in run['results'].items():
+        old = baseline['results'].get(key)
+        if old is None:
+            continue
+        ratio = result['mp_s'] / old['mp_s']
+        flag = ''
+        if ratio < 1 - tolerance:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f'{key:34} {old["mp_s"]:>10.2f} {result["mp_s"]:>10.2f} {ratio:>7.2f}{flag}')
+    return regressions
+
+
+def main(argv: [str] = None) -> int:
+    """Runs the command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(description='Benchmark MyImage and image_operations.')
+    parser.add_argument('--open-save', nargs='*', metavar='image',
+                        help='compare the old and new open/save paths instead')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES,
+                        help='sides of the synthetic square images')
+    parser.add_argument('--packed', action='store_true', help='use packed storage')
+    parser.add_argument('--save-baseline', metavar='FILE', help='store the results in FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare the results with FILE')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='throughput fraction lost before flagging a regression')
+    options = parser.parse_args(argv)
+
+    if options.open_save is not None:
+        bench_open_save(options.open_save or sorted(glob.glob(os.path.join(IMAGES, '*'))))
+        return 0
+    run = run_suite(options.sizes, options.packed)
+    if options.save_baseline:
+        with open(options.save_baseline, 'w') as file:
+            json.dump(run, file, indent=1)
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        if compare(run, baseline, options.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
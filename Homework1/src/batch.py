@@ -0,0 +1,216 @@
+"""Runs a chain of image operations over every image in a directory.
+
+Usage: python -m src.batch SRC_DIR DST_DIR OPERATION [OPERATION ...]
+           [--workers N] [--window N] [--packed] [--format EXT]
+
+An operation is the name of a function in image_operations, optionally
+followed by a colon and comma separated arguments, e.g.
+
+    python -m src.batch images out apply_mask:masks/mask-blur.txt \\
+        apply_mask:masks/mask-sobel-x.txt,False remove_channel:blue=True resize
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import ast
+import os
+import sys
+import time
+
+from PIL import Image
+from src.mask import Mask
+from src.myimage import MyImage
+from src import image_operations
+
+
+# The stages of a job, in order.
+STAGES = ('decode', 'compute', 'encode')
+
+
+def parse_operation(spec: str) -> (str, tuple, dict):
+    """Parses an operation given on the command line.
+
+    Arguments are Python literals where they parse as one and strings
+    otherwise. Masks are loaded here, once for the whole batch.
+
+    Args:
+    - spec: 'name' or 'name:arg,...,key=value,...'
+
+    Returns:
+    a tuple of the operation name, its positional and its keyword arguments.
+    """
+    name, _, rest = spec.partition(':')
+    assert callable(getattr(image_operations, name, None)) and not name.startswith('_'),\
+        f'Unknown image operation {name!r}'
+    args, kwargs = [], {}
+    for field in filter(None, rest.split(',')):
+        key, sep, value = field.partition('=')
+        if not sep:
+            key, value = None, field
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        if key is None:
+            args.append(value)
+        else:
+            kwargs[key] = value
+    if name == 'apply_mask' and args:
+        args[0] = Mask.load(args[0])
+    return name, tuple(args), kwargs
+
+
+def find_images(directory: str):
+    """Yields the paths of the files in directory that PIL can open, by their
+    extension, without listing the whole directory first.
+    """
+    extensions = Image.registered_extensions()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                yield entry.path
+
+
+# The operations run by a worker process, set by _init_worker().
+_operations: [(str, tuple, dict)] = []
+
+
+def _init_worker(operations: [(str, tuple, dict)]) -> None:
+    """Worker: keeps the operations, sent once rather than with every job."""
+    global _operations
+    _operations = operations
+
+
+def process(src_path: str, dst_path: str, packed: bool = False,
+            operations: [(str, tuple, dict)] = None) -> (int, [float]):
+    """Decodes src_path, runs the operations on it and encodes the result to
+    dst_path.
+
+    Args:
+    - src_path: path to the source image
+    - dst_path: path to write the result to, its format given by the extension
+    - packed: if True, the image uses packed storage
+    - operations: the parsed operations, those of the worker by default
+
+    Returns:
+    a tuple of the number of source pixels and the seconds spent in each stage.
+    """
+    times = []
+    start = time.perf_counter()
+    img = MyImage.open(src_path, packed=packed)
+    times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pixels = img.size[0] * img.size[1]
+    for name, args, kwargs in operations if operations is not None else _operations:
+        img = getattr(image_operations, name)(img, *args, **kwargs)
+        assert isinstance(img, MyImage), f'{name} does not return an image'
+    times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    img.save(dst_path)
+    times.append(time.perf_counter() - start)
+    return pixels, times
+
+
+def run_batch(src_dir: str, dst_dir: str, operations: [(str, tuple, dict)],
+              workers: int = None, window: int = None, packed: bool = False,
+              extension: str = None) -> dict:
+    """Runs the operations over every image in src_dir with a process pool,
+    writing the results to dst_dir under the same names.
+
+    Every worker decodes, computes and encodes one image at a time, so with
+    several workers the three stages of different images overlap. Files are
+    listed lazily and at most window jobs are in flight, which bounds memory
+    however many images there are. An image that fails is reported and
+    skipped.
+
+    Args:
+    - src_dir: the directory holding the source images
+    - dst_dir: the directory to write the results to, created if needed
+    - operations: the operations to run, see parse_operation()
+    - workers: the number of processes, os.cpu_count() by default
+    - window: the most jobs in flight, twice the number of workers by default
+    - packed: if True, images use packed storage
+    - extension: the extension, hence format, of the results, e.g. '.png',
+      that of each source by default
+
+    Returns:
+    a dict of the 'images' and 'pixels' processed, the 'seconds' of wall
+    time, the summed seconds of each stage in 'stages' and the 'failures' as
+    (path, error) pairs.
+    """
+    workers = workers or os.cpu_count()
+    window = window or 2 * workers
+    os.makedirs(dst_dir, exist_ok=True)
+    stats = {'images': 0, 'pixels': 0, 'seconds': 0.0,
+             'stages': dict.fromkeys(STAGES, 0.0), 'failures': []}
+
+    def collect(done) -> None:
+        for future in done:
+            src_path = pending.pop(future)
+            try:
+                pixels, times = future.result()
+            except Exception as error:
+                stats['failures'].append((src_path, repr(error)))
+                continue
+            stats['images'] += 1
+            stats['pixels'] += pixels
+            for stage, seconds in zip(STAGES, times):
+                stats['stages'][stage] += seconds
+
+    start = time.perf_counter()
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(operations,)) as executor:
+        for src_path in find_images(src_dir):
+            if len(pending) >= window:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            root, ext = os.path.splitext(os.path.basename(src_path))
+            dst_path = os.path.join(dst_dir, root + (extension or ext))
+            pending[executor.submit(process, src_path, dst_path, packed)] = src_path
+        collect(wait(pending).done)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def report(stats: dict, file=sys.stdout) -> None:
+    """Prints the overall and per-stage throughput of a batch.
+
+    Stage throughput is per worker: pixels over the seconds the workers spent
+    in the stage.
+    """
+    seconds, megapixels = stats['seconds'], stats['pixels'] / 1e6
+    print(f'{stats["images"]} images, {megapixels:.1f} MP in {seconds:.2f}s: '
+          f'{stats["images"] / seconds:.1f} images/s, {megapixels / seconds:.2f} MP/s',
+          file=file)
+    busy = sum(stats['stages'].values()) or 1
+    for stage, spent in stats['stages'].items():
+        rate = megapixels / spent if spent else float('inf')
+        print(f'  {stage:8} {spent:9.2f}s {100 * spent / busy:5.1f}% {rate:9.2f} MP/s',
+              file=file)
+    for path, error in stats['failures']:
+        print(f'failed: {path}: {error}', file=file)
+
+
+def main(argv: [str] = None) -> int:
+    """Runs the command line interface, see the module docstring."""
+    parser = argparse.ArgumentParser(prog='python -m src.batch',
+                                     description='Run image operations over a directory.')
+    parser.add_argument('src_dir')
+    parser.add_argument('dst_dir')
+    parser.add_argument('operations', nargs='+', metavar='operation')
+    parser.add_argument('--workers', type=int, help='number of processes')
+    parser.add_argument('--window', type=int, help='most images in flight')
+    parser.add_argument('--packed', action='store_true', help='use packed storage')
+    parser.add_argument('--format', dest='extension', help='extension of the results, e.g. .png')
+    options = parser.parse_args(argv)
+    operations = [parse_operation(spec) for spec in options.operations]
+    stats = run_batch(options.src_dir, options.dst_dir, operations, options.workers,
+                      options.window, options.packed, options.extension)
+    report(stats)
+    return 1 if stats['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
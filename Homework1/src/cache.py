@@ -0,0 +1,193 @@
+from collections import OrderedDict
+import functools
+import hashlib
+import inspect
+import array as arr
+import os
+import struct
+import tempfile
+
+from src.grayimage import GrayImage
+from src.mask import Mask
+from src.myimage import MyImage
+
+
+class ResultCache:
+    """Memoizes image operations on the contents of their input image.
+
+    A result is looked up by a hash of the operation name, the pixels of the
+    input image and the other arguments. Arguments named maskfile are hashed
+    by the mask values rather than by the path, so a mask file and the Mask
+    loaded from it give the same key. Results are kept in memory, least
+    recently used first dropped beyond memory_budget bytes, and optionally in
+    a directory on disk, which outlives the process.
+
+    Callers get copies of the cached results, so modifying them is safe.
+    """
+
+    def __init__(self, directory: str = None, memory_budget: int = 256 * 1024 * 1024) -> None:
+        """Creates an empty cache.
+
+        Args:
+        - directory: where to keep results on disk, created if needed. Results
+          are only kept in memory if it is None.
+        - memory_budget: the most bytes of pixels kept in memory
+        """
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.memory: OrderedDict = OrderedDict()
+        self.used = 0
+        self.hits = self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def call(self, operation, src: MyImage, *args, **kwargs) -> MyImage:
+        """Returns operation(src, *args, **kwargs), from the cache if possible.
+
+        Args:
+        - operation: an image operation, e.g. apply_mask
+        - src: the image to run it on
+        - args, kwargs: further arguments of the operation
+
+        Returns:
+        the result of the operation.
+        """
+        key = self.key(operation, src, *args, **kwargs)
+        result = self.memory.get(key)
+        if result is not None:
+            self.memory.move_to_end(key)
+        elif self.directory and os.path.exists(self._path(key)):
+            result = _load(self._path(key))
+            if result is not None:
+                self._remember(key, result)
+        if result is not None:
+            self.hits += 1
+            return result.copy()
+
+        self.misses += 1
+        result = operation(src, *args, **kwargs)
+        self._remember(key, result.copy())
+        if self.directory:
+            _store(self._path(key), result)
+        return result
+
+    def wrap(self, operation):
+        """Returns operation memoized through this cache.
+
+        Args:
+        - operation: an image operation, e.g. apply_mask
+
+        Returns:
+        a function taking the same arguments as operation.
+        """
+        @functools.wraps(operation)
+        def cached(src: MyImage, *args, **kwargs) -> MyImage:
+            return self.call(operation, src, *args, **kwargs)
+        return cached
+
+    def key(self, operation, src: MyImage, *args, **kwargs) -> str:
+        """Returns the hex digest identifying operation(src, *args, **kwargs).
+
+        Args:
+        - operation: an image operation
+        - src: the image to run it on
+        - args, kwargs: further arguments of the operation
+
+        Returns:
+        the key of the result.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{operation.__module__}.{operation.__qualname__}'
+                      f'{type(src).__name__}{src.size}{src.packed}'.encode())
+        for channel in _channels(src):
+            digest.update(channel)
+        bound = inspect.signature(operation).bind(src, *args, **kwargs)
+        bound.apply_defaults()
+        for name, value in list(bound.arguments.items())[1:]:
+            if name == 'maskfile' and not isinstance(value, Mask):
+                value = Mask.load(value)
+            digest.update(f'{name}={value!r};'.encode())
+        return digest.hexdigest()
+
+    def clear(self) -> None:
+        """Empties the memory tier. Results on disk are kept."""
+        self.memory.clear()
+        self.used = 0
+
+    def _remember(self, key: str, result: MyImage) -> None:
+        """Keeps result in memory, dropping old results to stay in budget."""
+        self.memory[key] = result
+        self.used += result.nbytes
+        while self.used > self.memory_budget and self.memory:
+            _, old = self.memory.popitem(last=False)
+            self.used -= old.nbytes
+
+    def _path(self, key: str) -> str:
+        """Returns the path of the file holding the result with key on disk."""
+        return os.path.join(self.directory, key + '.img')
+
+
+def _channels(img: MyImage) -> list:
+    """Returns the arrays holding the pixels of img: the gray values of a
+    GrayImage, the bytes of a packed image or the channels of an ArrayList.
+    """
+    if isinstance(img, GrayImage) or img.packed:
+        return [img.pixels.data]
+    return [img.pixels.r, img.pixels.g, img.pixels.b]
+
+
+# Header of a result on disk: a magic string, the storage mode (see _MODES)
+# and the width and height. The raw channel bytes follow.
+_HEADER = struct.Struct('<4sBII')
+_MAGIC = b'MYI1'
+# The storage modes: (gray, packed, typecode of the channel arrays).
+_MODES = [(False, False, 'i'), (False, True, 'B'), (True, False, 'B'),
+          (True, False, 'i'), (True, True, 'B')]
+
+
+def _store(path: str, img: MyImage) -> None:
+    """Writes img to path, atomically, with the exact values of its storage.
+
+    The file holds a fixed header and the raw bytes of the channels, in the
+    byte order of this machine, so loading it runs no code.
+    """
+    channels = _channels(img)
+    typecode = channels[0].typecode if isinstance(channels[0], arr.array) else 'B'
+    mode = _MODES.index((isinstance(img, GrayImage), img.packed, typecode))
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, mode, *img.size))
+        for channel in channels:
+            file.write(channel)
+    os.replace(tmp, path)
+
+
+def _load(path: str) -> MyImage:
+    """Returns the image written to path by _store(), or None if the file is
+    not one.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < _HEADER.size:
+        return None
+    magic, mode, width, height = _HEADER.unpack_from(data)
+    if magic != _MAGIC or mode >= len(_MODES):
+        return None
+    gray, packed, typecode = _MODES[mode]
+    count = 1 if gray or packed else 3
+    length = width * height * (3 if packed and not gray else 1)
+    channels = [arr.array(typecode) for _ in range(count)]
+    body = memoryview(data)[_HEADER.size:]
+    if len(body) != count * length * channels[0].itemsize:
+        return None
+    step = length * channels[0].itemsize
+    for k, channel in enumerate(channels):
+        channel.frombytes(body[k * step:(k + 1) * step])
+    if gray:
+        return GrayImage((width, height), packed=packed, data=channels[0])
+    img = MyImage((width, height), packed=packed)
+    if packed:
+        img.pixels.data[:] = channels[0]
+    else:
+        img.pixels.r, img.pixels.g, img.pixels.b = channels
+    return img
@@ -0,0 +1,239 @@
+import array as arr
+
+from PIL import Image
+from src.mylist import GrayArrayList, _gray_array
+from src.myimage import MyImage
+
+
+class GrayImage(MyImage):
+    """Holds a flattened grayscale image and its dimensions.
+
+    A drop-in MyImage whose pixels are a GrayArrayList: one value per pixel
+    in a single array('B'), read back as (v, v, v). Mask operations return
+    one, since their results are gray anyway. The RGB channels are only
+    materialized when the image is converted, e.g. on save(), or by to_rgb().
+    """
+
+    def __init__(self, size: (int, int), packed: bool = False, data=None) -> None:
+        """Initializes a black grayscale image of the given size.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - size: (width, height) specifies the dimensions to create.
+        - packed: if True, values are clamped to [0, 255] as in a packed
+          MyImage. Otherwise they are kept as they are, like in an ArrayList
+          backed one.
+        - data: an optional sequence of width * height gray values, see
+          GrayArrayList
+
+        Returns:
+        none
+        """
+        super().__init__(size, packed=packed, data=data, storage=GrayArrayList)
+
+    @property
+    def packed(self) -> bool:
+        """True if the values are clamped to [0, 255] like in a packed image."""
+        return self.pixels.clamp
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes the pixels take."""
+        return len(self.pixels.data) * self.pixels.data.itemsize
+
+    def buffer(self) -> memoryview:
+        """Returns a writable (height, width) view of the gray values.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        a memoryview over the values.
+        """
+        width, height = self.size
+        return self.pixels.buffer().cast('B').cast(self.pixels.typecode, (height, width))
+
+    def get_row(self, r: int) -> [memoryview]:
+        """Returns views of the red, green and blue values of row r.
+
+        All three are the same view of the gray values, see MyImage.get_row().
+
+        Parameters:
+        - self: mandatory reference to this object
+        - r: the row coordinate
+
+        Returns:
+        a list of the 3 channel views, each of width values.
+        """
+        width, height = self.size
+        assert 0 <= r < height, f'Bad image row {r} for image of size {self.size}'
+        row = self.pixels.buffer()[width * r:width * (r + 1)]
+        return [row] * 3
+
+    def set_row(self, r: int, channels) -> None:
+        """Writes the gray values of row r from 3 equal channels, or from a
+        single sequence of values.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - r: the row coordinate
+        - channels: 3 equal sequences of width ints, or one
+
+        Returns:
+        none
+        """
+        width, height = self.size
+        assert 0 <= r < height, f'Bad image row {r} for image of size {self.size}'
+        if len(channels) == 3 and not isinstance(channels[0], int):
+            values = [_gray_array(channel, self.packed) for channel in channels]
+            assert values[0] == values[1] == values[2], 'Cannot set a row of color values'
+            values = values[0]
+        else:
+            values = _gray_array(channels, self.packed)
+        assert len(values) == width, f'A row of this image has {width} values'
+        if values.typecode != self.pixels.typecode:
+            self.pixels.data = arr.array('i', self.pixels.data)
+            values = arr.array('i', values)
+        self.pixels.data[width * r:width * (r + 1)] = values
+        self.modified()
+
+    def to_pil(self) -> Image:
+        """Returns a PIL RGB image holding the pixels of this image.
+
+        The values are clamped to bytes and expanded to RGB by PIL.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the PIL image.
+        """
+        plane = self.pixels.data
+        if self.pixels.typecode != 'B':
+            plane = bytes(min(max(0, value), 255) for value in plane)
+        return Image.frombytes('L', self.size, bytes(plane)).convert('RGB')
+
+    def to_rgb(self, packed: bool = None) -> MyImage:
+        """Returns a copy of this image as an RGB MyImage.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - packed: whether the copy uses packed storage, like this image by
+          default
+
+        Returns:
+        the RGB image.
+        """
+        if packed is None:
+            packed = self.packed
+        myimg: MyImage = MyImage(self.size, packed=packed)
+        if packed:
+            myimg.pixels.frombytes(self.pixels.tobytes())
+        else:
+            myimg.pixels.r, myimg.pixels.g, myimg.pixels.b =\
+                [arr.array('i', self.pixels.data) for _ in range(3)]
+        return myimg
+
+    def to_array(self):
+        """Returns the pixels as a NumPy array of shape (height, width, 3).
+
+        The array is a read-only view of the gray values repeated across the
+        channels. See to_plane() for the values themselves.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the pixel array, uint8 unless values do not fit a byte, int32 then.
+        """
+        import numpy as np
+        width, height = self.size
+        return np.broadcast_to(self.to_plane()[:, :, np.newaxis], (height, width, 3))
+
+    def to_plane(self):
+        """Returns the gray values as a NumPy array of shape (height, width).
+
+        The array shares memory with this image.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the uint8 array, int32 if values do not fit a byte.
+        """
+        import numpy as np
+        width, height = self.size
+        data = self.pixels.data
+        dtype = np.uint8 if self.pixels.typecode == 'B' else np.int32
+        self.pixels.exposed = True
+        return np.frombuffer(data, dtype=dtype).reshape(height, width)
+
+    @staticmethod
+    def from_array(pixels, packed: bool = False) -> 'GrayImage':
+        """Creates and returns a grayscale image holding the given plane.
+
+        Parameters:
+        - pixels: integer array of shape (height, width)
+        - packed: if True, values are clamped to [0, 255]
+
+        Returns:
+        the image created from pixels.
+        """
+        import numpy as np
+        assert pixels.ndim == 2, f'A grayscale image needs a plane, not shape {pixels.shape}'
+        height, width = pixels.shape
+        if packed or pixels.size == 0 or (pixels.min() >= 0 and pixels.max() <= 255):
+            data = arr.array('B', np.clip(pixels, 0, 255).astype(np.uint8).tobytes())
+        else:
+            data = arr.array('i')
+            data.frombytes(np.ascontiguousarray(pixels, dtype=np.int32).tobytes())
+        return GrayImage((width, height), packed=packed, data=data)
+
+    def paste(self, src: 'GrayImage', r: int, c: int) -> None:
+        """Copies the grayscale image src into this one with its top left
+        corner at (r, c).
+
+        Rows are copied as slices. src must fit and have the same storage.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - src: the image to copy
+        - r: the row coordinate of the top left corner
+        - c: the column coordinate of the top left corner
+
+        Returns:
+        none
+        """
+        width, height = src.size
+        assert isinstance(src, GrayImage) and src.packed == self.packed,\
+            'Cannot paste between storage types'
+        assert 0 <= r and r + height <= self.size[1] and 0 <= c and c + width <= self.size[0],\
+            f'Image of size {src.size} does not fit at ({r}, {c}) in {self.size}'
+        source = src._planes()[0]
+        if src.pixels.typecode != self.pixels.typecode:
+            self.pixels.data = arr.array('i', self.pixels.data)
+            source = arr.array('i', source)
+        target = self.pixels.data
+        stride = self.size[0]
+        start = r * stride + c
+        for i in range(height):
+            target[start + i * stride:start + i * stride + width] =\
+                source[i * width:(i + 1) * width]
+        self.modified()
+
+    def _empty(self, size: (int, int)) -> 'GrayImage':
+        """Returns a black grayscale image of size with the storage of this one."""
+        return GrayImage(size, packed=self.packed)
+
+    def _planes(self) -> list:
+        """Returns the gray values as the only plane, copied if they are held
+        in a mapped file.
+        """
+        data = self.pixels.data
+        return [arr.array('B', data) if isinstance(data, memoryview) else data]
+
+    def _from_planes(self, planes: list, size: (int, int)) -> 'GrayImage':
+        """Returns a grayscale image of size, with the storage of this one,
+        holding the plane in planes (see _planes()).
+        """
+        return GrayImage(size, packed=self.packed, data=planes[0])
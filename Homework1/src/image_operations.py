@@ -1,11 +1,22 @@
 from src.myimage import MyImage
+from src.grayimage import GrayImage
+from src.mask import Mask
+from collections import Counter, OrderedDict
+import array as arr
 import math
+import weakref
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, Python loops are used without it.
+    np = None
 
 
 def remove_channel(src: MyImage, red: bool = False, green: bool = False, blue: bool = False) -> MyImage:
     """Returns a copy of src in which the indicated channels are suppressed.
 
     Suppresses the red channel if no channel is indicated. src is not modified.
+    This is apply_lut() with an all zero table for the suppressed channels.
 
     Args:
     - src: the image whose copy the indicated channels have to be suppressed.
@@ -16,70 +27,169 @@ def remove_channel(src: MyImage, red: bool = False, green: bool = False, blue: b
     Returns:
     a copy of src with the indicated channels suppressed.
     """
-    width, height = src.size                    # get width and height seperately
-    # create a blank copy of src dimensions
-    img = MyImage(src.size)
-
-    # looping over the pixels using x,y coordinatess
-    for x in range(width):
-        for y in range(height):
-            # get the rgb components at x,y coordinates
-            r, g, b = src.get(x, y)
-            if red == True:
-                r = 0
-            if green == True:
-                g = 0
-            if blue == True:
-                b = 0
-            else:
-                r = 0
-            # use MyImage setter function to set new rgb values
-            img.set(x, y, (r, g, b))
-    return img
+    tables = [None if keep else ZERO_LUT for keep in _kept_channels(red, green, blue)]
+    return apply_lut(src, *tables)
 
 
-def rotations(src: MyImage) -> MyImage:
-    """Returns an image containing the 4 rotations of src.
+# A lookup table mapping every value to 0, which suppresses a channel.
+ZERO_LUT = bytes(256)
 
-    The new image has twice the dimensions of src. src is not modified.
+
+def apply_lut(src: MyImage, red=None, green=None, blue=None) -> MyImage:
+    """Returns a copy of src with its channels remapped through lookup tables.
+
+    Each table has 256 entries in [0, 255]; value v of the channel becomes
+    table[v]. A channel whose table is None is copied unchanged. Every
+    remapped channel is translated in a single pass over its bytes, with no
+    Python loop over the pixels. Values of an ArrayList channel outside
+    [0, 255] are clamped before the lookup, as they would be on saving.
 
     Args:
-    - src: the image whose rotations have to be stored and returned.
+    - src: the image whose channels are to be remapped. It is not modified.
+    - red, green, blue: the tables for the channels, e.g. a list or bytes
 
     Returns:
-    an image twice the size of src and containing the 4 rotations of src.
+    a copy of src with the tables applied, with the storage of src. A
+    GrayImage stays one if the three tables are the same.
     """
-    original_width, original_height = src.size
+    tables = [table if table is None else _lut(table) for table in (red, green, blue)]
+    if isinstance(src, GrayImage):
+        if tables[0] == tables[1] == tables[2]:
+            return src._from_planes([_remap(src.pixels.data, tables[0])], src.size)
+        src = src.to_rgb()
+    planes = [_remap(plane, table) for plane, table in zip(src._planes(), tables)]
+    return src._from_planes(planes, src.size)
 
-    new_width = original_width * 2
-    new_height = original_height * 2
 
-    resulting_image = MyImage((new_width, new_height))
+def _lut(table) -> bytes:
+    """Returns the 256 entry lookup table as bytes, checking its entries."""
+    assert len(table) == 256, f'A lookup table needs 256 entries, not {len(table)}'
+    assert all(0 <= value <= 255 for value in table), 'Lookup table entries must be in [0, 255]'
+    return bytes(table)
 
-    for row in range(original_height):
-        for column in range(original_width):
-            # looping over each pixel to set rgb values
 
-            rgb_value = src.get(row, column)
+def _remap(plane, table: bytes):
+    """Returns a copy of the flat channel plane with table applied, of the
+    same type as plane. The plane is copied as is if table is None.
+    """
+    if table is None:
+        # A slice of a memoryview, e.g. of a mapped file, would share its memory.
+        return bytes(plane) if isinstance(plane, memoryview) else plane[:]
+    if isinstance(plane, arr.array):
+        remapped = _byte_plane(plane).translate(table)
+        return arr.array(plane.typecode, arr.array('B', remapped))
+    return bytes(plane).translate(table)
+
+
+def _byte_plane(plane) -> bytes:
+    """Returns the values of the flat channel plane as bytes, clamped to [0, 255]."""
+    if isinstance(plane, arr.array) and plane.typecode != 'B':
+        if plane and (min(plane) < 0 or max(plane) > 255):
+            plane = [min(max(0, value), 255) for value in plane]
+        plane = arr.array('B', plane)
+    return bytes(plane)
+
+
+def histogram(src: MyImage) -> ([int], [int], [int]):
+    """Returns the histograms of the red, green and blue channels of src.
+
+    Each channel is counted in one pass, with NumPy if it is installed and
+    with collections.Counter otherwise. Values outside [0, 255] are counted
+    as 0 or 255, as they would be saved.
+
+    Args:
+    - src: the image whose histograms are wanted
+
+    Returns:
+    three lists of 256 counts, entry v of which is the number of pixels with
+    value v in the channel.
+    """
+    counts = []
+    planes = _channels(src)
+    for k, plane in enumerate(planes):
+        if k and plane is planes[k - 1]:        # the gray plane of a GrayImage, counted once
+            counts.append(list(counts[-1]))
+            continue
+        data = _byte_plane(plane)
+        if np is not None:
+            counts.append(np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256).tolist())
+        else:
+            counter = Counter(data)
+            counts.append([counter[value] for value in range(256)])
+    return tuple(counts)
+
+
+def statistics(src: MyImage) -> [(int, int, float)]:
+    """Returns the minimum, maximum and mean of each channel of src.
+
+    The channel arrays are scanned with the built-in min(), max() and sum(),
+    so the values are exact, including ones outside [0, 255].
+
+    Args:
+    - src: the image whose statistics are wanted
+
+    Returns:
+    a list of (minimum, maximum, mean) tuples for red, green and blue.
+    """
+    width, height = src.size
+    assert width * height, 'An empty image has no statistics'
+    return [(min(plane), max(plane), sum(plane) / (width * height))
+            for plane in _channels(src)]
+
+
+def _channels(src: MyImage) -> list:
+    """Returns the red, green and blue channels of src as flat sequences,
+    see MyImage._planes(). The gray plane stands for all three channels of a
+    GrayImage.
+    """
+    if isinstance(src, GrayImage):
+        return [src.pixels.data] * 3
+    return src._planes()
+
+
+def _kept_channels(red: bool = False, green: bool = False, blue: bool = False) -> (int, int, int):
+    """Returns 1 for each channel remove_channel() keeps and 0 for each it suppresses.
+
+    Args:
+    - red, green, blue: the flags passed to remove_channel()
+
+    Returns:
+    the (red, green, blue) multipliers.
+    """
+    r, g, b = 1, 1, 1
+    if red == True:
+        r = 0
+    if green == True:
+        g = 0
+    if blue == True:
+        b = 0
+    else:
+        r = 0
+    return r, g, b
 
-            # 1st image (rotated 90 degrees anticlockwise) on 1st row, 1st column
-            resulting_image.set(original_height - 1 - column, row, rgb_value)
 
-            # 2nd image (original / unrotated) on 1st row, 2nd column
-            resulting_image.set(row, column + original_width, rgb_value)
+def rotations(src: MyImage) -> MyImage:
+    """Returns an image containing the 4 rotations of src.
 
-            # 3rd image (upside down / rotated 180 degrees) on 2nd row, 1st column
-            resulting_image.set(original_width - 1 - row + original_height,
-                                original_height - 1 - column, rgb_value)
+    The new image has twice the dimensions of src. src is not modified.
 
-            # 4th image (rotated 270 degrees anticlockwise / 90 degrees clockwise) on 2nd row, 2nd column
-            resulting_image.set(column + original_height,
-                                original_height - 1 - row + original_width, rgb_value)
+    Args:
+    - src: the image whose rotations have to be stored and returned.
 
+    Returns:
+    an image twice the size of src and containing the 4 rotations of src.
+    """
+    width, height = src.size
+    assert width == height, 'rotations needs a square image'
+    resulting_image = src._empty((2 * width, 2 * height))
+    resulting_image.paste(src.rotate(1), 0, 0)              # 90 degrees anticlockwise
+    resulting_image.paste(src, 0, width)                    # original
+    resulting_image.paste(src.rotate(2), height, 0)         # upside down
+    resulting_image.paste(src.rotate(3), height, width)     # 270 degrees anticlockwise
     return resulting_image
 
 
-def apply_mask(src: MyImage, maskfile: str, average: bool = True) -> MyImage:
+def apply_mask(src: MyImage, maskfile, average: bool = True, size: (int, int) = None) -> MyImage:
     """Returns an copy of src with the mask from maskfile applied to it.
 
     maskfile specifies a text file which contains an n by n mask. It has the
@@ -87,77 +197,499 @@ def apply_mask(src: MyImage, maskfile: str, average: bool = True) -> MyImage:
     - the first line contains n
     - the next n^2 lines contain 1 element each of the flattened mask
 
+    maskfile can also be a Mask loaded beforehand with Mask.load(), which
+    avoids reading the file again when the mask is applied to many images.
+
+    The mask is applied with whole-array NumPy operations when NumPy is
+    installed and with plain Python loops otherwise. A mask that factors into
+    an integer column kernel times an integer row kernel (e.g. the Sobel masks)
+    is applied as a vertical pass over a horizontal pass, which takes 2n
+    instead of n^2 multiplications per pixel. A uniform mask is handed to
+    box_blur(). All engines give the same result.
+
+    The result is gray, so it is returned as a GrayImage, which stores one
+    value per pixel. Its values are clamped to bytes if src is packed.
+
+    Given a smaller size, the mask is applied at that scale instead: to src
+    shrunk from the nearest level of its cached pyramid(), see shrink().
+
+    Args:
+    - src: the image on which the mask is to be applied
+    - maskfile: path to a file specifying the mask to be applied, or a Mask
+    - average: if True, averaging should to done when applying the mask
+    - size: optional (width, height), at most that of src, to apply the mask at
+
+    Returns:
+    a grayscale image which the result of applying the specified mask to src.
+    """
+    mask = _read_mask(maskfile)
+    if size is not None:
+        src = shrink(src, size)
+    if mask.is_box(average):
+        return box_blur(src, mask.n, average)
+    if np is not None:
+        return MyImage.from_array(_mask_plane(_gray_numpy(src), mask, average),
+                                  packed=src.packed)
+    if mask.kernels:                            # (vertical, horizontal) kernels if the mask has rank 1
+        return _apply_separable_python(src, *mask.kernels, average)
+    return _apply_mask_python(src, mask, average)
+
+
+def box_blur(src: MyImage, n: int, average: bool = True) -> MyImage:
+    """Returns a copy of src with an n by n all ones mask applied to it.
+
+    Equivalent to apply_mask() with such a mask, including at the edges where
+    the taps outside the image are dropped and the divisor shrinks. Each pixel
+    is read off the integral image (summed-area table) of src in constant
+    time, whatever n is. The integral image is computed on first use and kept
+    with src until src is modified.
+
     Args:
     - src: the image on which the mask is to be applied
-    - maskfile: path to a file specifying the mask to be applied
+    - n: the mask is n by n
     - average: if True, averaging should to done when applying the mask
 
     Returns:
-    an image which the result of applying the specified mask to src.
+    a grayscale image which the result of applying the mask to src.
+    """
+    width, height = src.size
+    origin = n // 2
+    table = _integral(src)
+
+    if np is not None:
+        return MyImage.from_array(_box_plane(table, n, average), packed=src.packed)
+
+    plane = [0] * (width * height)
+    for x in range(height):
+        top, bottom = max(x - origin, 0), min(x - origin + n, height)
+        upper, lower = table[top], table[bottom]
+        for y in range(width):
+            left, right = max(y - origin, 0), min(y - origin + n, width)
+            rgb = lower[right] - upper[right] - lower[left] + upper[left]
+            if average == True:
+                rgb //= (bottom - top) * (right - left)
+            else:
+                rgb = min(max(0, rgb), 255)
+            plane[x * width + y] = rgb
+    return _plane_image(src, plane, src.size)
+
+
+def _integral(src: MyImage):
+    """Returns the integral image of the grayscale plane of src.
+
+    Entry [x][y] is the sum of the (r + g + b) // 3 values in rows 0 to x - 1
+    and columns 0 to y - 1, so it has one more row and column than src. It is
+    a NumPy array if NumPy is installed and a list of lists otherwise. The
+    table is cached with src.
+
+    Args:
+    - src: the image whose integral image is wanted
+
+    Returns:
+    the (height + 1) by (width + 1) integral image.
+    """
+    table = src._cached('integral')
+    if table is not None:
+        return table
+    width, height = src.size
+    if np is not None:
+        table = _integral_plane(_gray_numpy(src))
+    else:
+        table = [[0] * (width + 1)]
+        for x in range(height):
+            above, running = table[-1], 0
+            row = [0]
+            for y in range(width):
+                running += sum(src.get(x, y)) // 3
+                row.append(above[y + 1] + running)
+            table.append(row)
+    src._keep('integral', table)
+    return table
+
+
+def _read_mask(maskfile) -> Mask:
+    """Returns the mask in maskfile, or maskfile itself if it is a Mask.
+
+    Args:
+    - maskfile: path to a file specifying the mask, see apply_mask(), or a Mask
+
+    Returns:
+    the mask.
     """
-    width, height = src.size                    # get width and height seperately                            
-    img = MyImage(src.size)                     # create a blank copy of src dimensions
+    if isinstance(maskfile, Mask):
+        return maskfile
+    return Mask.load(maskfile)
 
-    mask = open(maskfile, 'r').read()
-    mask = mask.splitlines()
-    mask = list(map(int, mask))                 # produces a list of int values of the file contents
-    n = mask[0]                                 # n: matrix size for nxn
-    mask = mask[1:]                             # listing matrix values in a list
 
-    # calculating sum of mask values for weighted average
-    origin = n // 2                               # center of mask appears at n//2,n//2 position in matrix
-    # oi = math.ceil((n**2)/2)                    # index of origin in mask list
+def _apply_mask_python(src: MyImage, mask: Mask, average: bool) -> MyImage:
+    """Returns a copy of src with the mask applied, using Python loops.
 
-    for x in range(width):                        # looping over the pixels of the image
-        for y in range(height):
-            # initial weighted r,g,b values
+    The grayscale plane is computed once. Where the whole mask fits, a pixel
+    is the sum of its nonzero taps at precomputed flat offsets and the divisor
+    is the mask total; only the pixels along the edges check which taps fall
+    inside the image.
+
+    Args:
+    - src: the image on which the mask is to be applied
+    - mask: the mask to be applied
+    - average: if True, averaging should to done when applying the mask
+
+    Returns:
+    an image which the result of applying the mask to src.
+    """
+    width, height = src.size                    # get width and height seperately
+    gray = _gray_python(src)
+    offsets = mask.offsets(width)
+    top, bottom, left, right = mask.interior(src.size)
+    plane = [0] * (width * height)
+
+    for x in range(height):                       # looping over the pixels of the image
+        row = x * width
+        if top <= x < bottom:
+            inner = range(left, right)
+            for k in range(row + left, row + right):
+                rgb = 0
+                for offset, value in offsets:
+                    rgb += gray[k + offset] * value
+                plane[k] = _finish(rgb, mask.total, average)
+        else:
+            inner = range(0)
+        for y in range(width):
+            if y in inner:
+                continue
+            # edge pixel: only the taps inside the image count
             rgb = 0
             mask_sum = 0
+            for di, dj, value in mask.taps:
+                ix = x + di                       # gives row coordinate of image when mask is applied
+                iy = y + dj                       # gives col coordinate of image when mask is applied
+                if 0 <= ix < height and 0 <= iy < width:       # check edges
+                    rgb += gray[ix * width + iy] * value
+                    mask_sum += value
+            plane[row + y] = _finish(rgb, mask_sum, average)
 
-            for i in range(n):                    # looping over rows and columns of mask ie a nxn matrix
-                for j in range(n):
-
-                    index = (n * i) + j           # index of element we want to access from mask list
-                    ix = x + i - origin           # gives row coordinate of image when mask is applied
-                    iy = y + j - origin           # gives col coordinate of image when mask is applied
-                    
-                    if ix >= 0 and ix < width and iy >= 0 and iy < height:       # check edges
-                    # if 0<=ix<width and 0<=iy<height:
-                        r, g, b = src.get(ix, iy)
-                        # adding weighted sums
-                        rgb += ((r + g + b) // 3) * mask[index] 
-                        mask_sum += mask[index]
-
-            if average == True and mask_sum != 0:  
-                w_avg = rgb // mask_sum                  # for weighted averge
-                rgb = min(max(0,rgb),255)
-                img.set(x, y, (w_avg, w_avg, w_avg))
-            else:
-                rgb = min(max(0,rgb),255)
-                img.set(x, y, (rgb, rgb, rgb))     # for weighted sum
+    return _plane_image(src, plane, src.size)
 
-    # img.show()
-    return img
+
+def _finish(rgb: int, mask_sum: int, average: bool) -> int:
+    """Returns the weighted sum rgb divided by mask_sum when averaging, and
+    clamped to [0, 255] when not or if mask_sum is 0, as apply_mask() does.
+    """
+    if average == True and mask_sum != 0:
+        return rgb // mask_sum                  # for weighted averge
+    return min(max(0, rgb), 255)                # for weighted sum
 
 
-def resize(src: MyImage) -> MyImage:
+def _gray_python(src: MyImage) -> [int]:
+    """Returns the (r + g + b) // 3 grayscale plane of src as a flat list."""
+    if isinstance(src, GrayImage):
+        return list(src.pixels.data)
+    return [(r + g + b) // 3 for r, g, b in zip(*src._planes())]
+
+
+def _plane_image(src: MyImage, plane: [int], size: (int, int)) -> GrayImage:
+    """Returns a grayscale image of size holding the flat plane. Values are
+    clamped if src is packed and kept as they are otherwise.
+    """
+    return GrayImage(size, packed=src.packed, data=plane)
+
+
+def _apply_separable_python(src: MyImage, vertical: [int], horizontal: [int], average: bool) -> MyImage:
+    """Returns a copy of src with a separable mask applied, using Python loops.
+
+    The grayscale plane is filtered along its rows with the horizontal kernel
+    and the result along its columns with the vertical kernel. Taps outside
+    the image are dropped from both passes, so the mask sum at a pixel is the
+    in-bounds vertical sum times the in-bounds horizontal sum.
+
+    Args:
+    - src: the image on which the mask is to be applied
+    - vertical: the kernel applied down the columns
+    - horizontal: the kernel applied along the rows
+    - average: if True, averaging should to done when applying the mask
+
+    Returns:
+    an image which the result of applying the mask to src.
+    """
+    width, height = src.size
+    n = len(horizontal)
+    origin = n // 2
+    plane = [0] * (width * height)
+
+    flat = _gray_python(src)
+    gray = [flat[x * width:(x + 1) * width] for x in range(height)]
+    # horizontal pass, and the in-bounds sum of the horizontal kernel per column
+    rows = [[sum(horizontal[j] * line[y + j - origin] for j in range(n)
+                 if 0 <= y + j - origin < width) for y in range(width)]
+            for line in gray]
+    column_sums = [sum(horizontal[j] for j in range(n) if 0 <= y + j - origin < width)
+                   for y in range(width)]
+
+    for x in range(height):
+        taps = [(vertical[i], rows[x + i - origin]) for i in range(n)
+                if 0 <= x + i - origin < height]
+        row_sum = sum(weight for weight, _ in taps)
+        for y in range(width):
+            rgb = sum(weight * row[y] for weight, row in taps)
+            plane[x * width + y] = _finish(rgb, row_sum * column_sums[y], average)
+
+    return _plane_image(src, plane, src.size)
+
+
+def _mask_plane(gray, mask: Mask, average: bool):
+    """Returns the result of applying the mask to a grayscale plane.
+
+    This is the NumPy engine of apply_mask(). It picks the box, separable or
+    general filter as apply_mask() describes. The result is not clamped where
+    it was averaged, as in apply_mask().
+
+    Args:
+    - gray: int64 array of (r + g + b) // 3 values, see _gray_numpy()
+    - mask: the mask to be applied
+    - average: if True, averaging should to done when applying the mask
+
+    Returns:
+    the resulting int64 plane.
+    """
+    if mask.is_box(average):
+        return _box_plane(_integral_plane(gray), mask.n, average)
+    if mask.kernels:
+        return _separable_plane(gray, *mask.kernels, average)
+    return _convolve_plane(gray, mask, average)
+
+
+def _convolve_plane(gray, mask: Mask, average: bool):
+    """Returns the result of applying the mask to a grayscale plane.
+
+    The plane is zero padded by the mask radius and the weighted sum is
+    accumulated over shifted slices of it, one for each nonzero mask value.
+    Slices under equal values are added up first and multiplied once. The sum
+    of the mask values that fall inside the image, used for averaging, is the
+    product R M C^T where M is the mask and R and C flag the in-bounds mask
+    rows and columns for every image row and column.
+
+    Args:
+    - gray: int64 array of (r + g + b) // 3 values, see _gray_numpy()
+    - mask: the mask to be applied
+    - average: if True, averaging should to done when applying the mask
+
+    Returns:
+    the resulting int64 plane.
+    """
+    height, width = gray.shape
+    n, origin = mask.n, mask.origin
+    padded = np.pad(gray, origin)
+
+    total = np.zeros((height, width), dtype=np.int64)
+    for value, positions in mask.groups.items():
+        part = np.zeros((height, width), dtype=np.int64) if value != 1 else total
+        for i, j in positions:
+            part += padded[i:i + height, j:j + width]
+        if value != 1:
+            total += value * part
+
+    mask_sum = None
+    if average:
+        weights = np.array(mask.values, dtype=np.int64).reshape(n, n)
+        mask_sum = _inside(height, n, origin) @ weights @ _inside(width, n, origin).T
+    return _finish_plane(total, mask_sum)
+
+
+def _separable_plane(gray, vertical: [int], horizontal: [int], average: bool):
+    """Returns the result of applying a separable mask to a grayscale plane.
+
+    See _apply_separable_python() for the two passes and _convolve_plane()
+    for the padding.
+
+    Args:
+    - gray: int64 array of (r + g + b) // 3 values, see _gray_numpy()
+    - vertical: the kernel applied down the columns
+    - horizontal: the kernel applied along the rows
+    - average: if True, averaging should to done when applying the mask
+
+    Returns:
+    the resulting int64 plane.
+    """
+    height, width = gray.shape
+    n = len(horizontal)
+    origin = n // 2
+    padded = np.pad(gray, origin)
+
+    rows = np.zeros((height + 2 * origin, width), dtype=np.int64)
+    for j, weight in enumerate(horizontal):
+        if weight:
+            rows += weight * padded[:, j:j + width]
+    total = np.zeros((height, width), dtype=np.int64)
+    for i, weight in enumerate(vertical):
+        if weight:
+            total += weight * rows[i:i + height]
+
+    mask_sum = None
+    if average:
+        mask_sum = np.outer(_inside(height, n, origin) @ np.array(vertical),
+                            _inside(width, n, origin) @ np.array(horizontal))
+    return _finish_plane(total, mask_sum)
+
+
+def _box_plane(table, n: int, average: bool):
+    """Returns the result of applying an n by n all ones mask to a plane.
+
+    Args:
+    - table: the integral image of the plane, see _integral_plane()
+    - n: the mask is n by n
+    - average: if True, averaging should to done when applying the mask
+
+    Returns:
+    the resulting int64 plane.
+    """
+    height, width = table.shape[0] - 1, table.shape[1] - 1
+    origin = n // 2
+    rows = np.arange(height) - origin
+    cols = np.arange(width) - origin
+    top, bottom = np.clip(rows, 0, height), np.clip(rows + n, 0, height)
+    left, right = np.clip(cols, 0, width), np.clip(cols + n, 0, width)
+    total = table[np.ix_(bottom, right)] - table[np.ix_(top, right)]\
+        - table[np.ix_(bottom, left)] + table[np.ix_(top, left)]
+    count = np.outer(bottom - top, right - left) if average else None
+    return _finish_plane(total, count)
+
+
+def _integral_plane(gray):
+    """Returns the integral image of a plane as an int64 array, see _integral()."""
+    height, width = gray.shape
+    table = np.zeros((height + 1, width + 1), dtype=np.int64)
+    table[1:, 1:] = gray.cumsum(axis=0).cumsum(axis=1)
+    return table
+
+
+def _gray_numpy(src: MyImage):
+    """Returns the (r + g + b) // 3 grayscale plane of src as an int64 array."""
+    if isinstance(src, GrayImage):
+        return src.to_plane().astype(np.int64)
+    return src.to_array().astype(np.int64).sum(axis=2) // 3
+
+
+def _pixels_numpy(src: MyImage):
+    """Returns the pixel array of src, the (height, width) plane of a GrayImage."""
+    if isinstance(src, GrayImage):
+        return src.to_plane()
+    return src.to_array()
+
+
+def _finish_plane(total, mask_sum):
+    """Returns the weighted sums in total divided by mask_sum where it is
+    nonzero, if given, and clamped to [0, 255] elsewhere, as apply_mask() does.
+    """
+    result = np.clip(total, 0, 255)
+    if mask_sum is not None:
+        nonzero = mask_sum != 0
+        result[nonzero] = total[nonzero] // mask_sum[nonzero]
+    return result
+
+
+def _inside(length: int, n: int, origin: int):
+    """Returns a length by n 0/1 array whose entry [x, i] is 1 if mask offset i
+    lands inside [0, length) when the mask is centred on coordinate x.
+    """
+    coords = np.arange(length)[:, np.newaxis] + np.arange(n) - origin
+    return ((0 <= coords) & (coords < length)).astype(np.int64)
+
+
+def edge_detect(src: MyImage, direction: bool = False):
+    """Returns the Sobel gradient magnitude of src, and optionally its direction.
+
+    This fuses applying masks/mask-sobel-x.txt and masks/mask-sobel-y.txt
+    and combining the results: the grayscale plane is computed once and both
+    gradients are taken in the same sweep over it, before any clamping. As in
+    apply_mask(), taps outside the image are dropped.
+
+    Args:
+    - src: the image whose edges are wanted
+    - direction: if True, also return the gradient direction
+
+    Returns:
+    a grayscale image holding sqrt(gx^2 + gy^2) rounded down and clamped to 255, where
+    gx and gy are the horizontal and vertical gradients. If direction is True,
+    a tuple of that image and one holding the direction of the gradient in
+    whole degrees in [0, 180), i.e. atan2(gy, gx) modulo a half turn.
+    """
+    if np is not None:
+        gx, gy = _sobel_planes(_gray_numpy(src))
+        magnitude = MyImage.from_array(np.minimum(np.sqrt(gx * gx + gy * gy).astype(np.int64), 255),
+                                       packed=src.packed)
+        if not direction:
+            return magnitude
+        angle = np.rint(np.degrees(np.arctan2(gy, gx))).astype(np.int64) % 180
+        return magnitude, MyImage.from_array(angle, packed=src.packed)
+
+    width, height = src.size
+    # zero pad the grayscale plane by a pixel so no tap needs a bounds check
+    stride = width + 2
+    padded = [0] * (stride * (height + 2))
+    gray = _gray_python(src)
+    for x in range(height):
+        start = (x + 1) * stride + 1
+        padded[start:start + width] = gray[x * width:(x + 1) * width]
+
+    magnitudes = [0] * (width * height)
+    angles = [0] * (width * height) if direction else None
+    for x in range(height):
+        for y in range(width):
+            k = (x + 1) * stride + y + 1
+            top_left, top, top_right = padded[k - stride - 1:k - stride + 2]
+            left, _, right = padded[k - 1:k + 2]
+            bottom_left, bottom, bottom_right = padded[k + stride - 1:k + stride + 2]
+            gx = top_right + 2 * right + bottom_right - top_left - 2 * left - bottom_left
+            gy = top_left + 2 * top + top_right - bottom_left - 2 * bottom - bottom_right
+            magnitudes[x * width + y] = min(math.isqrt(gx * gx + gy * gy), 255)
+            if direction:
+                angles[x * width + y] = round(math.degrees(math.atan2(gy, gx))) % 180
+
+    magnitude = _plane_image(src, magnitudes, src.size)
+    if not direction:
+        return magnitude
+    return magnitude, _plane_image(src, angles, src.size)
+
+
+def _sobel_planes(gray):
+    """Returns the horizontal and vertical Sobel gradients of a grayscale plane,
+    the results of applying the Sobel x and y masks without averaging or
+    clamping.
+    """
+    padded = np.pad(gray, 1)
+    # the plane smoothed down the columns and along the rows, with a border
+    columns = padded[:-2] + 2 * padded[1:-1] + padded[2:]
+    rows = padded[:, :-2] + 2 * padded[:, 1:-1] + padded[:, 2:]
+    gx = columns[:, 2:] - columns[:, :-2]
+    gy = rows[:-2] - rows[2:]
+    return gx, gy
+
+
+def resize(src: MyImage, size: (int, int) = None) -> MyImage:
     """Returns an image which has twice the dimensions of src.
 
     The new image has twice the dimensions of src. src is not modified.
+    Given a smaller size, src is shrunk to it instead, see shrink().
 
     Args:
     - src: the image which needs to be resized.
+    - size: optional (width, height), at most that of src, to shrink to
 
     Returns:
-    an image twice the size of src.
+    an image twice the size of src, or of the given size.
     """
+    if size is not None:
+        return shrink(src, size)
+    if np is not None:
+        return MyImage.from_array(_resize_array(_pixels_numpy(src).astype(np.int64)),
+                                  packed=src.packed)
 
     original_width, original_height = src.size # dimensions of original image
 
     new_width = original_width * 2  # dimensions of enlarged image
     new_height = original_height * 2
 
-    resulting_image = MyImage((new_width, new_height)) # new object created for enlarged image
+    resulting_image = src._empty((new_width, new_height)) # new object created for enlarged image, a GrayImage for a GrayImage
 
     for row in range(original_height): # looping over each pixel of the original image instead of enlarged image to avoid excessive looping
         for column in range(original_width):
@@ -222,3 +754,256 @@ def resize(src: MyImage) -> MyImage:
                         (row * 2) + 1, (column * 2) + 1, (current_red, current_green, current_blue))  # setting the same rgb values as the blocks above for the last row
 
     return resulting_image
+
+
+def _rotations_array(pixels):
+    """Returns the NumPy array of rotations() of a square pixel array."""
+    n = pixels.shape[0]
+    assert pixels.shape[1] == n, 'rotations needs a square image'
+    result = np.empty((2 * n, 2 * n) + pixels.shape[2:], dtype=pixels.dtype)
+    result[:n, :n] = np.rot90(pixels)           # 90 degrees anticlockwise
+    result[:n, n:] = pixels
+    result[n:, :n] = pixels[::-1, ::-1]         # 180 degrees
+    result[n:, n:] = np.rot90(pixels, -1)       # 270 degrees anticlockwise
+    return result
+
+
+def _resize_array(pixels):
+    """Returns the NumPy array of resize() of an int64 pixel array.
+
+    pixels may hold one plane or several channels; they are resized alike.
+    The averages truncate towards zero like int() in resize().
+    """
+    height, width = pixels.shape[:2]
+    result = np.empty((2 * height, 2 * width) + pixels.shape[2:], dtype=np.int64)
+    below = np.concatenate([pixels[1:], pixels[-1:]])   # the last row averages with itself
+    vertical = ((pixels + below) / 2).astype(np.int64)
+    vertical[-1] = pixels[-1]
+    diagonal = ((pixels[:, :-1] + below[:, :-1] + pixels[:, 1:] + below[:, 1:]) / 4)\
+        .astype(np.int64)
+    diagonal[-1] = pixels[-1, :-1]
+
+    result[0::2, 0::2] = pixels
+    result[0::2, 1:-1:2] = ((pixels[:, :-1] + pixels[:, 1:]) / 2).astype(np.int64)
+    result[0::2, -1] = pixels[:, -1]
+    result[1::2, 0::2] = vertical
+    result[1::2, 1:-1:2] = diagonal
+    result[1::2, -1] = vertical[:, -1]
+    return result
+
+
+def resample(src: MyImage, size: (int, int), method: str = 'bilinear', mipmap: bool = False) -> MyImage:
+    """Returns a copy of src scaled to the given size.
+
+    Unlike resize(), the size is arbitrary and may shrink the image. The
+    source rows and columns read for each result row and column, with their
+    weights, are worked out once per axis. The image is then resampled along
+    its rows and then along its columns, whole rows at a time when NumPy is
+    installed. Channel values are rounded and clamped to [0, 255].
+
+    Args:
+    - src: the image to scale
+    - size: (width, height) of the result
+    - method: 'nearest' takes the closest source pixel, 'bilinear'
+      interpolates between the 2 closest source pixels along each axis and
+      'box' averages the source pixels covered, weighted by coverage, which
+      suits shrinking
+    - mipmap: if True, shrinking starts from the smallest level of the cached
+      pyramid() of src that is at least size, which is faster and, for
+      'bilinear', smoother
+
+    Returns:
+    the scaled image.
+    """
+    assert method in _TAPS, f'Unknown resampling method {method!r}'
+    assert size[0] > 0 and size[1] > 0, f'Invalid size {size}'
+    if mipmap:
+        src = pyramid_level(src, size)
+    width, height = src.size
+    columns = _TAPS[method](width, size[0])
+    rows = _TAPS[method](height, size[1])
+
+    if np is not None:
+        return MyImage.from_array(_resample_array(_pixels_numpy(src), columns, rows),
+                                  packed=src.packed)
+
+    img = src._empty(size)
+    planes = [[[src.get(r, c)[k] for c in range(width)] for r in range(height)]
+              for k in range(3)]
+    for k, plane in enumerate(planes):
+        # resample along the rows, then down the columns
+        plane = [[sum(weight * line[i] for i, weight in taps) for taps in columns]
+                 for line in plane]
+        planes[k] = [[sum(weight * plane[i][c] for i, weight in taps)
+                      for c in range(size[0])] for taps in rows]
+    for r in range(size[1]):
+        for c in range(size[0]):
+            img.set(r, c, tuple(min(max(0, round(plane[r][c])), 255) for plane in planes))
+    return img
+
+
+def _resample_array(pixels, columns: [[(int, float)]], rows: [[(int, float)]]):
+    """Returns the NumPy engine of resample() applied to a pixel array.
+
+    pixels may hold one plane or several channels. columns and rows are the
+    taps of every result column and row, see _nearest_taps().
+    """
+    pixels = pixels.astype(np.float64)
+    for axis, taps in ((1, columns), (0, rows)):
+        count = max(len(tap) for tap in taps)
+        index = np.zeros((len(taps), count), dtype=np.intp)
+        weight = np.zeros((len(taps), count))
+        for j, tap in enumerate(taps):
+            for k, (i, w) in enumerate(tap):
+                index[j, k], weight[j, k] = i, w
+        shape = [1] * pixels.ndim
+        shape[axis] = len(taps)
+        result = None
+        for k in range(count):                  # same order of sums as the Python engine
+            term = np.take(pixels, index[:, k], axis=axis) * weight[:, k].reshape(shape)
+            result = term if result is None else result + term
+        pixels = result
+    return np.clip(np.rint(pixels), 0, 255).astype(np.int64)
+
+
+def _nearest_taps(source: int, target: int) -> [[(int, float)]]:
+    """Returns, for each of target output positions along an axis of source
+    pixels, the list of (source index, weight) pairs it is made of.
+
+    Output pixel x is centred on source coordinate (x + 0.5) * source / target.
+    """
+    scale = source / target
+    return [[(min(int((x + 0.5) * scale), source - 1), 1.0)] for x in range(target)]
+
+
+def _bilinear_taps(source: int, target: int) -> [[(int, float)]]:
+    """Returns the taps interpolating between the 2 nearest source pixels, see
+    _nearest_taps(). Positions past the first or last pixel centre use it alone.
+    """
+    scale = source / target
+    taps = []
+    for x in range(target):
+        position = min(max((x + 0.5) * scale - 0.5, 0), source - 1)
+        left = int(position)
+        fraction = position - left
+        if fraction == 0:
+            taps.append([(left, 1.0)])
+        else:
+            taps.append([(left, 1 - fraction), (left + 1, fraction)])
+    return taps
+
+
+def _box_taps(source: int, target: int) -> [[(int, float)]]:
+    """Returns the taps averaging the source pixels covered by each output
+    pixel, weighted by how much of each is covered, see _nearest_taps().
+    """
+    scale = source / target
+    taps = []
+    for x in range(target):
+        start, stop = x * scale, (x + 1) * scale
+        taps.append([(i, (min(stop, i + 1) - max(start, i)) / scale)
+                     for i in range(int(start), min(math.ceil(stop), source))
+                     if min(stop, i + 1) > max(start, i)])
+    return taps
+
+
+# Tap functions of the resample() methods.
+_TAPS = {'nearest': _nearest_taps, 'bilinear': _bilinear_taps, 'box': _box_taps}
+
+
+# The most bytes of pyramid levels kept cached, over all images.
+PYRAMID_BUDGET = 256 * 1024 * 1024
+
+# Images with a cached pyramid, least recently used first, mapped from their
+# id to a weak reference to them and the bytes their levels take.
+_pyramids = OrderedDict()
+
+
+def pyramid(src: MyImage, levels: int = None) -> [MyImage]:
+    """Returns the image pyramid of src: src followed by successive halvings.
+
+    Each level is the previous one shrunk to half its width and height
+    (rounded down, at least 1) with resample()'s box method, i.e. by averaging
+    2 by 2 blocks. Levels are computed on first request and cached with src
+    until it is modified. Only the levels below src are cached, so src does
+    not refer to itself and is freed as soon as it is unused. When the cached
+    levels of all images exceed PYRAMID_BUDGET bytes, those of the least
+    recently used images are dropped.
+
+    Args:
+    - src: the base image of the pyramid
+    - levels: the number of levels wanted, including src. By default levels
+      are added until a 1 by 1 image is reached.
+
+    Returns:
+    the list of levels, src first.
+    """
+    cached = src._cached('pyramid')
+    if cached is None:
+        cached = []
+    last = cached[-1] if cached else src
+    while (levels is None or len(cached) + 1 < levels) and last.size != (1, 1):
+        width, height = last.size
+        last = resample(last, (max(width // 2, 1), max(height // 2, 1)), 'box')
+        cached.append(last)
+    src._keep('pyramid', cached)
+    _pyramids.pop(id(src), None)
+    _pyramids[id(src)] = (weakref.ref(src), sum(level.nbytes for level in cached))
+    _evict_pyramids()
+    return ([src] + cached)[:levels]
+
+
+def shrink(src: MyImage, size: (int, int)) -> MyImage:
+    """Returns a copy of src shrunk to size, starting from its nearest
+    pyramid level.
+
+    The level from pyramid_level() is copied if it has the size, and box
+    resampled to it otherwise, as resample() with mipmap does. Either way the
+    result shares no pixels with src or its cached pyramid.
+
+    Args:
+    - src: the image to shrink
+    - size: (width, height), at most that of src
+
+    Returns:
+    the shrunk image.
+    """
+    assert 0 < size[0] <= src.size[0] and 0 < size[1] <= src.size[1],\
+        f'Cannot shrink an image of size {src.size} to {size}'
+    level = pyramid_level(src, size)
+    if level.size == tuple(size):
+        return level.copy()
+    return resample(level, size, 'box')
+
+
+def pyramid_level(src: MyImage, size: (int, int)) -> MyImage:
+    """Returns the smallest level of pyramid(src) at least size in both dimensions.
+
+    Args:
+    - src: the base image of the pyramid
+    - size: (width, height) the level has to cover
+
+    Returns:
+    the pyramid level, src itself if it is not twice size.
+    """
+    width, height = src.size
+    levels = 1
+    while width >= 2 * size[0] and height >= 2 * size[1]:
+        width, height = width // 2, height // 2
+        levels += 1
+    return pyramid(src, levels)[-1]
+
+
+def _evict_pyramids() -> None:
+    """Drops cached pyramids, least recently used first, until those left fit
+    in PYRAMID_BUDGET. Entries of images since freed or modified are dropped
+    first.
+    """
+    for key, (ref, _) in list(_pyramids.items()):
+        if ref() is None or 'pyramid' not in ref()._cache:
+            del _pyramids[key]
+    used = sum(nbytes for _, nbytes in _pyramids.values())
+    while used > PYRAMID_BUDGET and _pyramids:
+        _, (ref, nbytes) = _pyramids.popitem(last=False)
+        ref()._cache.pop('pyramid', None)
+        used -= nbytes
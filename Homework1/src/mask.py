@@ -0,0 +1,155 @@
+import math
+
+
+class Mask:
+    """An n by n mask, as read from a mask file, with what applying it needs
+    worked out once so that it can be reused across any number of images.
+
+    A mask file has the following format:
+    - the first line contains n
+    - the next n^2 lines contain 1 element each of the flattened mask
+
+    Attributes:
+    - n: the mask is n by n
+    - values: the flattened mask, row by row
+    - origin: the row and column of the centre of the mask, n // 2
+    - halo: the (above, below) number of rows the mask reads around a pixel
+    - total: the sum of the values, the divisor wherever the whole mask fits
+    - taps: (row offset, column offset, value) of the nonzero values,
+      relative to the centre
+    - groups: the nonzero values mapped to the list of (row, column) mask
+      positions holding them, so equal weights can be applied once
+    - kernels: the (vertical, horizontal) integer kernels whose product is
+      the mask, or None if it is not separable
+    - symmetric: True if the mask is unchanged by a half turn
+    - uniform: True if all values are equal and nonzero
+    """
+
+    def __init__(self, n: int, values: [int]) -> None:
+        """Creates the n by n mask with the given flattened values.
+
+        Args:
+        - n: the mask is n by n
+        - values: the n^2 values, row by row
+        """
+        assert n > 0 and len(values) == n * n,\
+            f'A {n} by {n} mask needs {n * n} values, not {len(values)}'
+        self.n = n
+        self.values = list(values)
+        self.origin = n // 2
+        self.halo = (self.origin, n - 1 - self.origin)
+        self.total = sum(values)
+        self.taps = [(i - self.origin, j - self.origin, values[n * i + j])
+                     for i in range(n) for j in range(n) if values[n * i + j]]
+        self.groups = {}
+        for i in range(n):
+            for j in range(n):
+                if values[n * i + j]:
+                    self.groups.setdefault(values[n * i + j], []).append((i, j))
+        self.kernels = _separate(n, self.values)
+        self.symmetric = self.values == self.values[::-1]
+        self.uniform = len(set(values)) == 1 and values[0] != 0
+        # Flat index offsets of the taps, by image width.
+        self._offsets = {}
+
+    @staticmethod
+    def load(maskfile: str) -> 'Mask':
+        """Reads and returns the mask in maskfile.
+
+        Args:
+        - maskfile: path to a file specifying the mask
+
+        Returns:
+        the mask.
+        """
+        with open(maskfile, 'r') as file:
+            values = list(map(int, file.read().splitlines()))
+        return Mask(values[0], values[1:])
+
+    def __repr__(self) -> str:
+        return f'Mask({self.n}, {self.values})'
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Mask) and self.values == other.values
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.values))
+
+    def is_box(self, average: bool) -> bool:
+        """Returns True if applying this mask is the same as a box blur.
+
+        That is the case for a uniform mask when averaging, where the weight
+        cancels out, and for an all ones mask otherwise.
+
+        Args:
+        - average: if True, the mask is applied with averaging
+
+        Returns:
+        whether the mask can be applied as a box blur.
+        """
+        return self.uniform and (average or self.values[0] == 1)
+
+    def interior(self, size: (int, int)) -> (int, int, int, int):
+        """Returns the pixels of an image of the given size where the whole mask
+        fits, so no tap needs a bounds check and the divisor is total.
+
+        Args:
+        - size: (width, height) of the image
+
+        Returns:
+        (top, bottom, left, right) such that the mask fits at the rows from
+        top to bottom - 1 and the columns from left to right - 1. The range
+        is empty if the mask fits nowhere.
+        """
+        width, height = size
+        below = self.n - 1 - self.origin
+        return (self.origin, max(height - below, self.origin),
+                self.origin, max(width - below, self.origin))
+
+    def offsets(self, width: int) -> [(int, int)]:
+        """Returns (flat index offset, value) of the taps in an image of width.
+
+        Computed once per width.
+
+        Args:
+        - width: the width of the flattened image
+
+        Returns:
+        the offsets of the nonzero values from the centre pixel.
+        """
+        offsets = self._offsets.get(width)
+        if offsets is None:
+            offsets = self._offsets[width] = [(di * width + dj, value)
+                                              for di, dj, value in self.taps]
+        return offsets
+
+
+def _separate(n: int, values: [int]) -> ([int], [int]):
+    """Factors the n by n mask into integer kernels if it has rank 1.
+
+    The horizontal kernel is the first nonzero mask row divided by the gcd of
+    its entries, so every other row must be an integer multiple of it. These
+    multiples form the vertical kernel, i.e. values[n*i + j] equals
+    vertical[i] * horizontal[j].
+
+    Args:
+    - n: the mask is n by n
+    - values: the flattened mask
+
+    Returns:
+    the (vertical, horizontal) kernels, or None if the mask is not separable.
+    """
+    rows = [values[n * i:n * (i + 1)] for i in range(n)]
+    first = next((row for row in rows if any(row)), None)
+    if first is None:                           # all zero mask, nothing to gain
+        return None
+    divisor = math.gcd(*first)
+    horizontal = [value // divisor for value in first]
+    k = next(j for j in range(n) if horizontal[j])
+    vertical = []
+    for row in rows:
+        factor, remainder = divmod(row[k], horizontal[k])
+        if remainder or any(row[j] != factor * horizontal[j] for j in range(n)):
+            return None
+        vertical.append(factor)
+    return vertical, horizontal
@@ -1,5 +1,10 @@
+import array as arr
+
 from PIL import Image
-from src.mylist import ArrayList
+from src.mylist import ArrayList, MyList, PackedArrayList, _gray_array
+from src import pnm
+import os
+import tempfile
 
 
 class MyImage:
@@ -7,61 +12,155 @@ class MyImage:
     methods to allow iteration over this image.
     """
 
-    def __init__(self, size: (int, int)) -> None:
+    def __init__(self, size: (int, int), packed: bool = False,
+                 data=None, storage: type = None) -> None:
         """Initializes a black image of the given size.
 
         Parameters:
         - self: mandatory reference to this object
         - size: (width, height) specifies the dimensions to create.
+        - packed: if True, pixels are stored as interleaved RGB bytes in a
+          single buffer (PackedArrayList) instead of 3 integer channels.
+        - data: an optional writable buffer of width * height * 3 bytes, e.g.
+          shared memory, to hold the pixels. It is used as is, not copied or
+          cleared, and implies packed.
+        - storage: an optional MyList class to hold the pixels instead, created
+          as storage(width * height, data=data, clamp=packed), e.g.
+          GrayArrayList
     
         Returns:
         none
         """
         # Save size, create a list of the desired size with black pixels.
         width, height = self.size = size
-        self.pixels: ArrayList = ArrayList(width * height, value=(0, 0, 0))
+        if storage is not None:
+            self.pixels: MyList = storage(width * height, data=data, clamp=packed)
+        elif packed or data is not None:
+            self.pixels: MyList = PackedArrayList(width * height,
+                                                  value=(0, 0, 0), data=data)
+        else:
+            self.pixels: MyList = ArrayList(width * height, value=(0, 0, 0))
+        # Data derived from the pixels, e.g. the integral image, by name, with
+        # the state of the pixels it was derived from. See _cached().
+        self._cache: dict = {}
+        # The file, mmap, mode and offset in the mmap of the pixels of an image
+        # from open_mapped().
+        self._mapped: (str, object, str, int) = None
+
+    @property
+    def packed(self) -> bool:
+        """True if the pixels are stored as interleaved RGB bytes."""
+        return isinstance(self.pixels, PackedArrayList)
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes the pixels take."""
+        width, height = self.size
+        return width * height * (3 if self.packed else 3 * self.pixels.r.itemsize)
+
+    def __buffer__(self, flags: int) -> memoryview:
+        """Exposes the pixels of a packed image through the buffer protocol.
 
-    def __iter__(self) -> 'MyImage':
-        '''Iterator function to return an iterator (self) that allows iteration over
-        this image.
+        Only available on Python 3.12 onwards (PEP 688). Use buffer() on
+        earlier versions.
 
         Parameters:
         - self: mandatory reference to this object
+        - flags: the buffer flags requested by the consumer
 
         Returns:
-        an iterator (self) that allows iteration over this image.
-        '''
-        # Initialize iteration indexes.
-        self._iter_r: int = 0
-        self._iter_c: int = 0
-        return self
+        a memoryview over the pixel bytes.
+        """
+        return self.buffer()
 
-    def __next__(self):
-        ''''Iterator function to return the next value from this list.
+    def buffer(self) -> memoryview:
+        """Returns a writable view of the pixels of a packed image.
 
-        Image pixels are iterated over in a left-to-right, top-to-bottom order.
+        The view is shaped (height, width, 3) and shares memory with the image,
+        e.g. numpy.asarray(img.buffer()) or Image.frombuffer('RGB', img.size,
+        img.buffer(), 'raw', 'RGB', 0, 1) do not copy any pixels. Data cached
+        from the pixels is checked against them from then on, so writes
+        through the view are seen.
 
         Parameters:
         - self: mandatory reference to this object
 
         Returns:
-        the next value in this image since the last iteration.
+        a memoryview over the pixel bytes.
+        """
+        assert self.packed, 'Only packed images expose a pixel buffer'
+        width, height = self.size
+        return self.pixels.buffer().cast('B', (height, width, 3))
+
+    def __iter__(self):
+        '''Returns an iterator over the pixels of this image.
+
+        Image pixels are iterated over in a left-to-right, top-to-bottom
+        order. Every call returns a new iterator, so an image can be iterated
+        over by several loops at once.
+
+        Parameters:
+        - self: mandatory reference to this object
 
+        Returns:
+        an iterator over the RGB values of the pixels.
         '''
-        if self._iter_r < self.size[1]:  # Iteration within image bounds.
-            # Save current value as per iteration variables. Update the
-            # variables for the next iteration as per the iteration
-            # order. Return saved value.
-            value = self.get(self._iter_r, self._iter_c)
-            self._iter_c += 1
-            if self_iter_c == self.size[0]:
-                self_iter_c = 0
-                self_iter_r += 1
-            return value
-        else:  # Image bounds exceeded, end of iteration.
-            # Reset iteration variables, end iteration.
-            self._iter_r = self._iter_c = 0
-            raise StopIteration
+        return iter(self.pixels)
+
+    def get_row(self, r: int) -> [memoryview]:
+        """Returns views of the red, green and blue values of row r.
+
+        The views share memory with the image, so no pixel is copied: reading
+        them reads the image and writing them writes it. They hold ints, from
+        the int channels of an ArrayList or strided over the bytes of a packed
+        image.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - r: the row coordinate
+
+        Returns:
+        a list of the 3 channel views, each of width values.
+        """
+        width, height = self.size
+        assert 0 <= r < height, f'Bad image row {r} for image of size {self.size}'
+        if self.packed:
+            row = self.pixels.buffer()[3 * width * r:3 * width * (r + 1)]
+            return [row[k::3] for k in range(3)]
+        self.pixels.exposed = True
+        return [memoryview(channel)[width * r:width * (r + 1)]
+                for channel in (self.pixels.r, self.pixels.g, self.pixels.b)]
+
+    def set_row(self, r: int, channels) -> None:
+        """Writes the red, green and blue values of row r.
+
+        Each channel is copied as one slice, e.g. from get_row() of another
+        image. Values are clamped to [0, 255] for a packed image.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - r: the row coordinate
+        - channels: 3 sequences of width ints, e.g. arrays, bytes or views
+
+        Returns:
+        none
+        """
+        width, height = self.size
+        assert 0 <= r < height, f'Bad image row {r} for image of size {self.size}'
+        assert all(len(channel) == width for channel in channels),\
+            f'A row of this image has {width} values'
+        if self.packed:
+            row = slice(3 * width * r, 3 * width * (r + 1))
+            for k, channel in enumerate(channels):
+                self.pixels.data[row.start + k:row.stop:3] = _gray_array(channel, True)
+        else:
+            for target, channel in zip((self.pixels.r, self.pixels.g, self.pixels.b), channels):
+                if isinstance(channel, (bytes, bytearray)):
+                    channel = arr.array('B', channel)   # array('i', bytes) would read raw ints
+                if not (isinstance(channel, arr.array) and channel.typecode == 'i'):
+                    channel = arr.array('i', channel)
+                target[width * r:width * (r + 1)] = channel
+        self.modified()
 
     def _get_index(self, r: int, c: int) -> int:
         """Returns the list index for the given row, column coordinates.
@@ -83,7 +182,7 @@ class MyImage:
             f"(r, c): ({r}, {c}) for image of size: {self.size}"
         return r*width + c
 
-    def open(path: str) -> 'MyImage':
+    def open(path: str, packed: bool = False) -> 'MyImage':
         """Creates and returns an image containing from the information at file path.
 
         The image format is inferred from the file name. The read image is
@@ -91,25 +190,164 @@ class MyImage:
 
         Parameters:
         - path: path to the file containing image information
+        - packed: if True, the returned image uses packed RGB byte storage
 
         Returns:
         the image created using the information from file path.
         """
         # Use PIL to read the image information and store it in our instance.
-        img: Image = Image.open(path)
-        myimg: MyImage = MyImage(img.size)
         # Covert image to RGB. https://stackoverflow.com/a/11064935/1382487
-        img: Image = img.convert('RGB')
-        # Get list of pixel values (https://stackoverflow.com/a/1109747/1382487),
-        # copy to our instance and return it.
-        for i, rgb in enumerate(list(img.getdata())):
-            myimg.pixels.set(i, rgb)
+        return MyImage.from_pil(Image.open(path), packed=packed)
+
+    @staticmethod
+    def open_mapped(path: str, mode: str = 'r') -> 'MyImage':
+        """Creates and returns a packed image backed by the raw PNM file at path.
+
+        The pixels are memory mapped, not read: opening takes no time whatever
+        the size, pixel access goes straight to the page cache, and processes
+        mapping the same file read-only share one copy of it. A P6 image is
+        returned as a packed MyImage and a P5 (grayscale) one as a packed
+        GrayImage, both holding the mapped bytes.
+
+        Parameters:
+        - path: path to the raw 8-bit PPM (P6) or PGM (P5) file
+        - mode: 'r' maps the file read-only, 'r+' writes pixel changes through
+          to the file and 'c' keeps them private (copy-on-write)
+
+        Returns:
+        the image backed by the file.
+        """
+        magic, size, pixels, mapping, offset = pnm.map_pixels(path, mode)
+        if magic == b'P5':
+            from src.grayimage import GrayImage
+            myimg: MyImage = GrayImage(size, packed=True, data=pixels)
+        else:
+            myimg: MyImage = MyImage(size, data=pixels)
+        myimg.pixels.exposed = True                     # the file may be written by others
+        myimg._mapped = (path, mapping, mode, offset)
+        return myimg
+
+    def close(self) -> None:
+        """Unmaps the file backing an image from open_mapped().
+
+        The image must not be used afterwards. Does nothing for other images.
+        The file cannot be unmapped while views of the pixels, e.g. from
+        buffer() or get_row(), are alive: BufferError is then raised and the
+        image is left mapped and usable.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        none
+        """
+        if self._mapped:
+            mapping, offset = self._mapped[1], self._mapped[3]
+            nbytes = self.pixels.data.nbytes
+            self.pixels.data.release()
+            try:
+                mapping.close()
+            except BufferError:
+                self.pixels.data = memoryview(mapping)[offset:offset + nbytes]
+                raise
+            self._mapped = None
+
+    @staticmethod
+    def from_pil(img: Image, packed: bool = False) -> 'MyImage':
+        """Creates and returns an image holding the pixels of a PIL image.
+
+        The pixels are moved in bulk through Image.tobytes() rather than one
+        at a time.
+
+        Parameters:
+        - img: the PIL image, converted to RGB if needed
+        - packed: if True, the returned image uses packed RGB byte storage
+
+        Returns:
+        the image created from img.
+        """
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        myimg: MyImage = MyImage(img.size, packed=packed)
+        myimg.pixels.frombytes(img.tobytes())
+        return myimg
+
+    def to_pil(self) -> Image:
+        """Returns a PIL RGB image holding the pixels of this image.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the PIL image.
+        """
+        return Image.frombytes('RGB', self.size, self.pixels.tobytes())
+
+    def to_array(self):
+        """Returns the pixels as a NumPy array of shape (height, width, 3).
+
+        The array shares memory with a packed image. For an ArrayList image it
+        is a copy of the channels.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the pixel array, uint8 for packed images and int32 otherwise.
+        """
+        import numpy as np
+        width, height = self.size
+        if self.packed:
+            self.pixels.exposed = True
+            return np.frombuffer(self.pixels.data, dtype=np.uint8)\
+                .reshape(height, width, 3)
+        pixels = self.pixels
+        return np.stack([np.frombuffer(channel, dtype=np.int32)
+                         for channel in (pixels.r, pixels.g, pixels.b)],
+                        axis=-1).reshape(height, width, 3)
+
+    @staticmethod
+    def from_array(pixels, packed: bool = False) -> 'MyImage':
+        """Creates and returns an image holding the given pixel array.
+
+        Parameters:
+        - pixels: integer array of shape (height, width, 3), or of shape
+          (height, width) for a grayscale image, which is returned as a
+          GrayImage
+        - packed: if True, the returned image uses packed RGB byte storage
+          and values are clamped to [0, 255]
+
+        Returns:
+        the image created from pixels.
+        """
+        import numpy as np
+        if pixels.ndim == 2:
+            from src.grayimage import GrayImage
+            return GrayImage.from_array(pixels, packed=packed)
+        height, width = pixels.shape[:2]
+        channels = [pixels[:, :, k] for k in range(3)]
+        myimg: MyImage = MyImage((width, height), packed=packed)
+        if packed:
+            data = np.frombuffer(myimg.pixels.data, dtype=np.uint8)\
+                .reshape(height, width, 3)
+            for k, channel in enumerate(channels):
+                data[:, :, k] = np.clip(channel, 0, 255)
+            return myimg
+        for name, channel in zip('rgb', channels):
+            raw = np.ascontiguousarray(channel, dtype=np.int32).tobytes()
+            channel = arr.array('i')
+            channel.frombytes(raw)
+            setattr(myimg.pixels, name, channel)
         return myimg
 
     def save(self, path: str) -> None:
         """Saves the image to the given file path.
 
-        The image format is inferred from the file name.
+        The image format is inferred from the file name. An image mapped with
+        mode 'r+' and saved to its own file is flushed in place instead of
+        being written again. One mapped with another mode is written to a new
+        file that then replaces its own, as writing the file in place would
+        truncate it under the mapping.
 
         Parameters:
         - self: mandatory reference to this object
@@ -118,10 +356,22 @@ class MyImage:
         Returns:
         none
         """
+        if self._mapped and os.path.exists(path) and os.path.samefile(path, self._mapped[0]):
+            if self._mapped[2] == 'r+':
+                self._mapped[1].flush()
+                return
+            fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(path)[1],
+                                       dir=os.path.dirname(os.path.abspath(path)))
+            os.close(fd)
+            try:
+                self.to_pil().save(tmp)
+                os.replace(tmp, path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            return
         # Use PIL to write the image.
-        img: Image = Image.new("RGB", self.size)
-        img.putdata([rgb for rgb in self.pixels])
-        img.save(path)
+        self.to_pil().save(path)
 
     def get(self, r: int, c: int) -> (int, int, int):
         """Returns the value of the pixel at the given row and column coordinates.
@@ -150,6 +400,54 @@ class MyImage:
         """
         self.pixels[self._get_index(r, c)] = rgb
 
+    def modified(self) -> None:
+        """Drops data cached from the pixels, such as the integral image.
+
+        Writes through set(), the pixel list or views of the pixels make
+        cached data stale by themselves, see _cached(). Call this after
+        changing the pixel arrays in any other way, e.g. assigning to them.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        none
+        """
+        self.pixels.modified()
+        self._cache.clear()
+
+    def _cached(self, name: str):
+        """Returns the data cached under name, or None if there is none or the
+        pixels have changed since it was kept.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - name: the name of the data, e.g. 'integral'
+
+        Returns:
+        the cached data or None.
+        """
+        entry = self._cache.get(name)
+        if entry is None:
+            return None
+        if entry[0] != self.pixels.state():
+            del self._cache[name]
+            return None
+        return entry[1]
+
+    def _keep(self, name: str, value) -> None:
+        """Caches value, derived from the current pixels, under name.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - name: the name of the data, e.g. 'integral'
+        - value: the data
+
+        Returns:
+        none
+        """
+        self._cache[name] = (self.pixels.state(), value)
+
     def show(self) -> None:
         """Display the image in a GUI window.
 
@@ -159,6 +457,165 @@ class MyImage:
         none
         """
         # Use PIL to display the image.
-        img: Image = Image.new("RGB", self.size)
-        img.putdata([rgb for rgb in self.pixels])
-        img.show()
+        self.to_pil().show()
+
+    def transpose(self) -> 'MyImage':
+        """Returns a copy of this image mirrored along its main diagonal.
+
+        Pixel (r, c) of this image is pixel (c, r) of the result. Each channel
+        is copied a column at a time with strided slices, in blocks of rows
+        that stay in cache while their columns are copied.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the transposed image.
+        """
+        width, height = self.size
+        planes = [_transpose_plane(plane, width, height) for plane in self._planes()]
+        return self._from_planes(planes, (height, width))
+
+    def flip_vertical(self) -> 'MyImage':
+        """Returns a copy of this image upside down, copying rows as slices.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the flipped image.
+        """
+        width, height = self.size
+        planes = [_flip_plane(plane, width, height) for plane in self._planes()]
+        return self._from_planes(planes, self.size)
+
+    def flip_horizontal(self) -> 'MyImage':
+        """Returns a copy of this image mirrored left to right.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the flipped image.
+        """
+        width, height = self.size
+        planes = [_flip_plane(plane[::-1], width, height) for plane in self._planes()]
+        return self._from_planes(planes, self.size)
+
+    def rotate(self, turns: int = 1) -> 'MyImage':
+        """Returns a copy of this image rotated anticlockwise by turns * 90 degrees.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - turns: the number of quarter turns, negative for clockwise
+
+        Returns:
+        the rotated image.
+        """
+        turns %= 4
+        if turns == 1:
+            return self.transpose().flip_vertical()
+        if turns == 2:                          # reversing each channel turns it upside down
+            return self._from_planes([plane[::-1] for plane in self._planes()], self.size)
+        if turns == 3:
+            return self.flip_vertical().transpose()
+        return self.copy()
+
+    def copy(self) -> 'MyImage':
+        """Returns a copy of this image with the same storage.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the copy.
+        """
+        return self._from_planes([plane[:] for plane in self._planes()], self.size)
+
+    def paste(self, src: 'MyImage', r: int, c: int) -> None:
+        """Copies src into this image with its top left corner at (r, c).
+
+        Rows are copied as slices. src must fit and have the same storage.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - src: the image to copy
+        - r: the row coordinate of the top left corner
+        - c: the column coordinate of the top left corner
+
+        Returns:
+        none
+        """
+        width, height = src.size
+        assert src.packed == self.packed, 'Cannot paste between storage types'
+        assert 0 <= r and r + height <= self.size[1] and 0 <= c and c + width <= self.size[0],\
+            f'Image of size {src.size} does not fit at ({r}, {c}) in {self.size}'
+        if self.packed:
+            sources, targets, k = [src.pixels.data], [self.pixels.data], 3
+        else:
+            sources = [src.pixels.r, src.pixels.g, src.pixels.b]
+            targets = [self.pixels.r, self.pixels.g, self.pixels.b]
+            k = 1
+        stride = k * self.size[0]
+        start = r * stride + k * c
+        for source, target in zip(sources, targets):
+            for i in range(height):
+                target[start + i * stride:start + i * stride + k * width] =\
+                    source[i * k * width:(i + 1) * k * width]
+        self.modified()
+
+    def _empty(self, size: (int, int)) -> 'MyImage':
+        """Returns a black image of size with the storage of this one."""
+        return MyImage(size, packed=self.packed)
+
+    def _planes(self) -> list:
+        """Returns the red, green and blue channels as flat row-major sequences.
+
+        They are the channel arrays themselves for ArrayList storage and
+        bytes copies for packed storage.
+        """
+        if self.packed:
+            data = self.pixels.data
+            return [bytes(data[k::3]) for k in range(3)]
+        return [self.pixels.r, self.pixels.g, self.pixels.b]
+
+    def _from_planes(self, planes: list, size: (int, int)) -> 'MyImage':
+        """Returns an image of size, with the storage of this one, holding the
+        channels in planes (see _planes()).
+        """
+        myimg: MyImage = MyImage(size, packed=self.packed)
+        if self.packed:
+            for k, plane in enumerate(planes):
+                myimg.pixels.data[k::3] = plane
+        else:
+            myimg.pixels.r, myimg.pixels.g, myimg.pixels.b = planes
+        return myimg
+
+
+# Rows copied together in a blocked transpose.
+_BLOCK = 64
+
+
+def _transpose_plane(plane, width: int, height: int):
+    """Returns the transpose of a flat row-major width by height channel."""
+    out = _blank(plane)
+    for top in range(0, height, _BLOCK):
+        bottom = min(top + _BLOCK, height)
+        for c in range(width):
+            out[c * height + top:c * height + bottom] = plane[top * width + c:bottom * width:width]
+    return out
+
+
+def _flip_plane(plane, width: int, height: int):
+    """Returns a flat row-major width by height channel upside down."""
+    out = _blank(plane)
+    for r in range(height):
+        out[r * width:(r + 1) * width] = plane[(height - 1 - r) * width:(height - r) * width]
+    return out
+
+
+def _blank(plane):
+    """Returns a zeroed writable sequence of the same length and type as plane."""
+    if isinstance(plane, arr.array):
+        return arr.array(plane.typecode, bytes(len(plane) * plane.itemsize))
+    return bytearray(len(plane))
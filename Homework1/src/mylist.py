@@ -1,10 +1,19 @@
 import array as arr # importing array module
+import sys
+import zlib
 
 class MyList:
     '''A list interface. Also implements Iterator functions in order to support
     iteration over this list.
     '''
 
+    # Counts the writes made through the list, so data derived from its
+    # values can tell when it is stale, see state().
+    version = 0
+    # True once memory of the list has been handed out, e.g. by buffer(), as
+    # writes through it cannot be counted.
+    exposed = False
+
     def __init__(self, size: int, value=None) -> None:
         """Creates a list of the given size, optionally intializing elements to value.
 
@@ -34,18 +43,20 @@ class MyList:
         '''
         return self.size
 
-    def __getitem__(self, i: int):
+    def __getitem__(self, i):
         '''Returns the value at index, i. Allows indexing syntax.
 
         Ref: https://stackoverflow.com/a/33882066/1382487
 
         Parameters:
         - self: mandatory reference to this object
-        - i: the index from which to retrieve the value.
+        - i: the index from which to retrieve the value, or a slice
 
         Returns:
-        the value at index i.
+        the value at index i, or a Python list of the values in slice i.
         '''
+        if isinstance(i, slice):
+            return self.lst[i]
         # Ensure bounds.
         assert 0 <= i < len(self),\
             f'Getting invalid list index {i} from list of size {len(self)}'
@@ -58,48 +69,68 @@ class MyList:
 
         Parameters:
         - self: mandatory reference to this object
-        - i: the index of the elemnent to be set
-        - value: the value to be set
+        - i: the index of the elemnent to be set, or a slice
+        - value: the value to be set, or a sequence of as many values as
+          slice i selects
 
         Returns:
         none
         '''
+        self.version += 1
+        if isinstance(i, slice):
+            _check_slice(i, len(self), value)
+            self.lst[i] = value
+            return
         # Ensure bounds.
         assert 0 <= i < len(self),\
             f'Setting invalid list index {i} in list of size {len(self)}'
         self.lst[i] = value
 
-    def __iter__(self) -> 'MyList':
-        '''Iterator function to return an iterator (self) that allows iteration over
-        this list.
+    def __iter__(self):
+        '''Returns an iterator over the values of this list, in order.
+
+        Every call returns a new iterator, so a list can be iterated over by
+        several loops at once, e.g. nested ones.
 
         Parameters:
         - self: mandatory reference to this object
 
         Returns:
-        an iterator (self) that allows iteration over this list.
+        an iterator over the values of this list.
         '''
-        # Initialize iteration index.
-        self._iter_index: int = 0
-        return self
+        return iter(self.lst)
 
-    def __next__(self):
-        ''''Iterator function to return the next value from this list.
+    def state(self):
+        '''Returns a token that changes whenever the values of this list do.
+
+        It is the number of writes made through the list, and once its memory
+        has been handed out also a checksum of the values, so that writes
+        through views, which the list does not see, are caught as well.
 
         Parameters:
         - self: mandatory reference to this object
 
         Returns:
-        the next value in this list since the last iteration.
+        the token, to be compared with ==.
         '''
-        if self._iter_index < len(self):
-            value = self.get(self._iter_index)
-            self._iter_index += 1
-            return value
-        else:
-            # End of Iteration
-            self._index = 0
-            raise StopIteration
+        if self.exposed:
+            return (self.version, self._checksum())
+        return self.version
+
+    def modified(self) -> None:
+        '''Counts a write made to the values other than through the list.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        none
+        '''
+        self.version += 1
+
+    def _checksum(self) -> int:
+        '''Returns a checksum of the values, see state().'''
+        return hash(tuple(self.lst))
 
     def get(self, i: int):
         '''Returns the value at index, i.
@@ -132,7 +163,11 @@ class MyList:
 
 
 class ArrayList(MyList):
-    
+
+    # The version and channels for which all values were last known to be in
+    # [0, 255], see _in_range().
+    _checked = None
+
     def __init__(self, size: int, value: (int, int, int)) -> None:
         """Creates a list of the given size, optionally intializing elements to value.
 
@@ -148,9 +183,11 @@ class ArrayList(MyList):
         """
         self.size = size
         r,g,b = value
-        self.r = arr.array('i', [r]*size)
-        self.g = arr.array('i', [g]*size)
-        self.b = arr.array('i', [b]*size)
+        self.r = arr.array('i', [r]) * size
+        self.g = arr.array('i', [g]) * size
+        self.b = arr.array('i', [b]) * size
+        if all(0 <= v <= 255 for v in value):
+            self._mark_in_range()
 
     def __len__(self) -> int:
         '''Returns the size of the list. Allows len() to be called on it.
@@ -165,18 +202,21 @@ class ArrayList(MyList):
         '''
         return self.size
 
-    def __getitem__(self, i: int):
+    def __getitem__(self, i):
         '''Returns the value at index, i. Allows indexing syntax.
 
         Ref: https://stackoverflow.com/a/33882066/1382487
 
         Parameters:
         - self: mandatory reference to this object
-        - i: the index from which to retrieve the value.
+        - i: the index from which to retrieve the value, or a slice
 
         Returns:
-        the value at index i.
+        the value at index i, or a Python list of the values in slice i,
+        zipped from slices of the channels.
         '''
+        if isinstance(i, slice):
+            return list(zip(self.r[i], self.g[i], self.b[i]))
         # Ensure bounds.
         assert 0 <= i < len(self),\
             f'Getting invalid list index {i} from list of size {len(self)}'
@@ -185,22 +225,501 @@ class ArrayList(MyList):
         blue = self.b[i]
         return (red,green,blue)
 
-    def __setitem__(self, i: int, value: (int,int,int)) -> None:
+    def __setitem__(self, i, value: (int,int,int)) -> None:
         '''Sets the element at index, i, to value. Allows indexing syntax.
 
         Ref: https://stackoverflow.com/a/33882066/1382487
 
         Parameters:
         - self: mandatory reference to this object
-        - i: the index of the elemnent to be set
-        - value: the value to be set
+        - i: the index of the elemnent to be set, or a slice
+        - value: the value to be set, or a sequence of as many values as
+          slice i selects
 
         Returns:
         none
         '''
+        in_range = self._in_range()
+        self.version += 1
+        if isinstance(i, slice):
+            _check_slice(i, len(self), value)
+            if value:
+                for channel, values in zip((self.r, self.g, self.b), zip(*value)):
+                    values = arr.array('i', values)
+                    channel[i] = values
+                    in_range = in_range and 0 <= min(values) and max(values) <= 255
+            if in_range:
+                self._mark_in_range()
+            return
         # Ensure bounds.
         assert 0 <= i < len(self),\
             f'Setting invalid list index {i} in list of size {len(self)}'
         self.r[i] = value[0]
         self.g[i] = value[1]
-        self.b[i] = value[2]   
\ No newline at end of file
+        self.b[i] = value[2]
+        if in_range and all(0 <= v <= 255 for v in value):
+            self._mark_in_range()
+
+    def __iter__(self):
+        '''Returns a new iterator over the values of this list, in order.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        an iterator zipping the channels.
+        '''
+        return zip(self.r, self.g, self.b)
+
+    def _checksum(self) -> int:
+        '''Returns the CRC-32 of the channels, see MyList.state().'''
+        return zlib.crc32(self.b, zlib.crc32(self.g, zlib.crc32(self.r)))
+
+    def frombytes(self, data) -> None:
+        '''Replaces all values with the interleaved RGB bytes in data.
+
+        The channels are rebuilt in bulk, without a Python loop over pixels.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - data: a bytes-like object of 3 * len(self) bytes, e.g. from
+          PIL's Image.tobytes()
+
+        Returns:
+        none
+        '''
+        self.version += 1
+        assert len(data) == 3 * len(self),\
+            f'Cannot load {len(data)} bytes into {len(self)} RGB values'
+        self.r = arr.array('i', arr.array('B', data[0::3]))
+        self.g = arr.array('i', arr.array('B', data[1::3]))
+        self.b = arr.array('i', arr.array('B', data[2::3]))
+        self._mark_in_range()
+
+    def _mark_in_range(self) -> None:
+        '''Records that all values are in [0, 255] as of now.'''
+        self._checked = (self.version, self.r, self.g, self.b)
+
+    def _in_range(self) -> bool:
+        '''Returns whether all values are known to be in [0, 255] without
+        looking at them: no write has been made since _mark_in_range(), the
+        channels have not been replaced and no view of them was handed out.
+        '''
+        checked = self._checked
+        return (checked is not None and not self.exposed and checked[0] == self.version
+                and checked[1] is self.r and checked[2] is self.g and checked[3] is self.b)
+
+    def tobytes(self) -> bytearray:
+        '''Returns the values as interleaved RGB bytes.
+
+        Channel values outside [0, 255] are clamped, as PIL does when saving.
+        The channels are only scanned for such values when they may hold some.
+        Each channel is then copied as one strided slice of the low bytes of
+        its ints.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        a bytearray of 3 * len(self) bytes.
+        '''
+        data = bytearray(3 * len(self))
+        if not data:
+            return data
+        channels = [self.r, self.g, self.b]
+        if not self._in_range():
+            clamped = False
+            for k, channel in enumerate(channels):
+                if min(channel) < 0 or max(channel) > 255:
+                    channels[k] = arr.array('i', map(_clamp, channel))
+                    clamped = True
+            if not clamped:
+                self._mark_in_range()
+        itemsize = self.r.itemsize
+        low = 0 if sys.byteorder == 'little' else itemsize - 1
+        for offset, channel in enumerate(channels):
+            data[offset::3] = memoryview(channel).cast('B')[low::itemsize]
+        return data
+
+
+class PackedArrayList(MyList):
+    '''A list of RGB values packed into a single contiguous bytearray.
+
+    Pixels are stored interleaved as R, G, B bytes, i.e. 3 bytes per element
+    instead of the 12 used by ArrayList. The underlying bytearray supports the
+    buffer protocol, so it can be shared with PIL or NumPy without copying,
+    e.g. through buffer().
+    Channel values are clamped to [0, 255] when set, which is what saving an
+    ArrayList backed image does anyway.
+    '''
+
+    def __init__(self, size: int, value: (int, int, int) = (0, 0, 0),
+                 data=None) -> None:
+        """Creates a list of the given size, optionally intializing elements to value.
+
+        The list is static. It only has space for size elements.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - size: size of the list; space is reserved for these many elements.
+        - value: the optional initial value of the created elements.
+        - data: an optional writable buffer of 3 * size bytes to use as
+          storage instead of allocating a new one. value is ignored if given.
+
+        Returns:
+        none
+        """
+        self.size = size
+        if data is None:
+            data = bytearray(bytes(_clamp(v) for v in value) * size)
+        assert len(data) == 3 * size,\
+            f'Buffer of {len(data)} bytes cannot hold {size} RGB values'
+        self.data = data
+
+    def __len__(self) -> int:
+        '''Returns the size of the list. Allows len() to be called on it.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the size of the list.
+        '''
+        return self.size
+
+    def __getitem__(self, i) -> (int, int, int):
+        '''Returns the value at index, i. Allows indexing syntax.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - i: the index from which to retrieve the value, or a slice
+
+        Returns:
+        the value at index i, or a Python list of the values in slice i,
+        zipped from strided slices of the bytes.
+        '''
+        if isinstance(i, slice):
+            return list(zip(*(self.data[k] for k in _strided(i, len(self)))))
+        # Ensure bounds.
+        assert 0 <= i < len(self),\
+            f'Getting invalid list index {i} from list of size {len(self)}'
+        j = 3 * i
+        data = self.data
+        return (data[j], data[j + 1], data[j + 2])
+
+    def __setitem__(self, i, value: (int, int, int)) -> None:
+        '''Sets the element at index, i, to value. Allows indexing syntax.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - i: the index of the elemnent to be set, or a slice
+        - value: the value to be set, or a sequence of as many values as
+          slice i selects
+
+        Returns:
+        none
+        '''
+        self.version += 1
+        if isinstance(i, slice):
+            _check_slice(i, len(self), value)
+            if value:
+                for k, values in zip(_strided(i, len(self)), zip(*value)):
+                    self.data[k] = _gray_array(values, True)
+            return
+        # Ensure bounds.
+        assert 0 <= i < len(self),\
+            f'Setting invalid list index {i} in list of size {len(self)}'
+        j = 3 * i
+        self.data[j:j + 3] = bytes((_clamp(value[0]), _clamp(value[1]),
+                                    _clamp(value[2])))
+
+    def __iter__(self):
+        '''Returns a new iterator over the values of this list, in order.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        an iterator zipping the channels.
+        '''
+        data = memoryview(self.data)
+        return zip(data[0::3], data[1::3], data[2::3])
+
+    def frombytes(self, data) -> None:
+        '''Replaces all values with the interleaved RGB bytes in data.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - data: a bytes-like object of 3 * len(self) bytes, e.g. from
+          PIL's Image.tobytes()
+
+        Returns:
+        none
+        '''
+        self.version += 1
+        assert len(data) == 3 * len(self),\
+            f'Cannot load {len(data)} bytes into {len(self)} RGB values'
+        self.data[:] = data
+
+    def tobytes(self):
+        '''Returns the values as interleaved RGB bytes.
+
+        The storage itself is returned, not a copy.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the buffer holding the 3 * len(self) bytes.
+        '''
+        return self.data
+
+    def buffer(self) -> memoryview:
+        '''Returns a writable view of the packed bytes, sharing their memory.
+
+        The list itself does not implement the buffer protocol, which Python
+        classes only can from 3.12 on (PEP 688), so pass this view to PIL or
+        NumPy instead.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        a memoryview over the packed bytes.
+        '''
+        self.exposed = True
+        return memoryview(self.data)
+
+    def _checksum(self) -> int:
+        '''Returns the CRC-32 of the bytes, see MyList.state().'''
+        return zlib.crc32(self.data)
+
+
+class GrayArrayList(MyList):
+    '''A list of gray RGB values, i.e. with equal channels, stored as one
+    value per element in a single array('B').
+
+    That is a byte per element instead of the 3 of PackedArrayList and the 12
+    of ArrayList. Elements are still read as (v, v, v) tuples, so the list can
+    stand in for the other two. If clamp is True, values are clamped to
+    [0, 255] like PackedArrayList does. Otherwise they are kept as they are
+    like ArrayList does, and the array is widened to array('i') should a value
+    not fit in a byte, e.g. an unclamped mask average.
+    '''
+
+    def __init__(self, size: int, value: int = 0, data=None, clamp: bool = False) -> None:
+        """Creates a list of the given size, optionally intializing elements to value.
+
+        The list is static. It only has space for size elements.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - size: size of the list; space is reserved for these many elements.
+        - value: the optional initial gray value of the created elements.
+        - data: an optional sequence of size gray values to hold instead. An
+          array('B'), or array('i') if clamp is False, is used as is, not
+          copied, as is a memoryview of bytes, e.g. of a mapped file, if
+          clamp is True. value is ignored if given.
+        - clamp: if True, values are clamped to [0, 255]
+
+        Returns:
+        none
+        """
+        self.size = size
+        self.clamp = clamp
+        if data is None:
+            data = [value] * size
+        if clamp and isinstance(data, memoryview) and data.format == 'B':
+            self.data = data                            # never widened, so kept
+        else:
+            self.data = _gray_array(data, clamp)
+        assert len(self.data) == size,\
+            f'Cannot hold {len(self.data)} gray values in a list of size {size}'
+
+    def __len__(self) -> int:
+        '''Returns the size of the list. Allows len() to be called on it.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        the size of the list.
+        '''
+        return self.size
+
+    @property
+    def typecode(self) -> str:
+        '''The array typecode of the values, 'B' or 'i'.'''
+        if isinstance(self.data, memoryview):
+            return self.data.format
+        return self.data.typecode
+
+    def __getitem__(self, i) -> (int, int, int):
+        '''Returns the value at index, i. Allows indexing syntax.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - i: the index from which to retrieve the value, or a slice
+
+        Returns:
+        the value at index i, as an RGB tuple, or a Python list of the
+        values in slice i.
+        '''
+        if isinstance(i, slice):
+            values = self.data[i]
+            return list(zip(values, values, values))
+        # Ensure bounds.
+        assert 0 <= i < len(self),\
+            f'Getting invalid list index {i} from list of size {len(self)}'
+        value = self.data[i]
+        return (value, value, value)
+
+    def __setitem__(self, i: int, value) -> None:
+        '''Sets the element at index, i, to value. Allows indexing syntax.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - i: the index of the elemnent to be set
+        - value: the value to be set, a gray value or an RGB tuple with
+          equal channels, or a sequence of as many of these as slice i selects
+
+        Returns:
+        none
+        '''
+        self.version += 1
+        if isinstance(i, slice):
+            _check_slice(i, len(self), value)
+            indices = range(*i.indices(len(self)))
+            for k, item in zip(indices, value):
+                self[k] = item
+            return
+        # Ensure bounds.
+        assert 0 <= i < len(self),\
+            f'Setting invalid list index {i} in list of size {len(self)}'
+        if not isinstance(value, int):
+            assert value[0] == value[1] == value[2],\
+                f'Cannot set {value} in a list of gray values'
+            value = value[0]
+        if self.clamp:
+            value = _clamp(value)
+        elif not 0 <= value <= 255 and self.data.typecode == 'B':
+            self.data = arr.array('i', self.data)
+        self.data[i] = value
+
+    def __iter__(self):
+        '''Returns a new iterator over the values of this list, in order.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        an iterator over the values, as RGB tuples.
+        '''
+        return ((value, value, value) for value in self.data)
+
+    def frombytes(self, data) -> None:
+        '''Replaces all values with the interleaved RGB bytes in data.
+
+        Each pixel is converted to its (r + g + b) // 3 gray value, which is
+        exact for gray pixels.
+
+        Parameters:
+        - self: mandatory reference to this object
+        - data: a bytes-like object of 3 * len(self) bytes, e.g. from
+          PIL's Image.tobytes()
+
+        Returns:
+        none
+        '''
+        self.version += 1
+        assert len(data) == 3 * len(self),\
+            f'Cannot load {len(data)} bytes into {len(self)} RGB values'
+        values = arr.array('B', [(r + g + b) // 3 for r, g, b
+                                 in zip(data[0::3], data[1::3], data[2::3])])
+        if isinstance(self.data, memoryview):
+            self.data[:] = values                       # write through to the memory held
+        else:
+            self.data = values
+
+    def tobytes(self) -> bytearray:
+        '''Returns the values as interleaved RGB bytes.
+
+        Values outside [0, 255] are clamped, as PIL does when saving.
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        a bytearray of 3 * len(self) bytes.
+        '''
+        plane = _gray_array(self.data, True)
+        data = bytearray(3 * len(self))
+        for offset in range(3):
+            data[offset::3] = plane
+        return data
+
+    def buffer(self) -> memoryview:
+        '''Returns a writable view of the values, sharing their memory.
+
+        See PackedArrayList.buffer().
+
+        Parameters:
+        - self: mandatory reference to this object
+
+        Returns:
+        a memoryview over the values, of format 'B', or 'i' once widened.
+        '''
+        self.exposed = True
+        return memoryview(self.data)
+
+    def _checksum(self) -> int:
+        '''Returns the CRC-32 of the values, see MyList.state().'''
+        return zlib.crc32(self.data)
+
+
+def _gray_array(values, clamp: bool) -> arr.array:
+    '''Returns values as an array('B'), clamping them if clamp is True and
+    widening to an array('i') if they do not fit in a byte otherwise.
+
+    An array that needs no change is returned as is.
+    '''
+    if isinstance(values, arr.array) and (values.typecode == 'B'
+                                          or values.typecode == 'i' and not clamp):
+        return values
+    if isinstance(values, (bytes, bytearray)) or isinstance(values, memoryview) and values.format == 'B':
+        return arr.array('B', values)
+    values = list(values)
+    if values and (min(values) < 0 or max(values) > 255):
+        if not clamp:
+            return arr.array('i', values)
+        values = map(_clamp, values)
+    return arr.array('B', values)
+
+
+def _check_slice(index: slice, size: int, values) -> None:
+    '''Asserts that values has an element for each index slice selects in a
+    list of size, as the lists are static and cannot grow or shrink.
+    '''
+    count = len(range(*index.indices(size)))
+    assert len(values) == count,\
+        f'Cannot set {len(values)} values in a slice of {count} elements'
+
+
+def _strided(index: slice, size: int) -> [slice]:
+    '''Returns, for each of the 3 channels, the slice of the interleaved RGB
+    bytes holding the elements that index selects in a list of size.
+    '''
+    selected = range(*index.indices(size))
+    if not selected:
+        return [slice(0, 0)] * 3
+    first, last, step = selected[0], selected[-1], selected.step
+    slices = []
+    for k in range(3):
+        stop = 3 * last + k + (1 if step > 0 else -1)
+        slices.append(slice(3 * first + k, stop if stop >= 0 else None, 3 * step))
+    return slices
+
+
+def _clamp(value: int) -> int:
+    '''Returns value clamped to the range of a byte, [0, 255].'''
+    return min(max(0, value), 255)
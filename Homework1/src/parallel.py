@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import os
+
+from src.myimage import MyImage
+from src import image_operations
+
+
+def run_tiled(operation, src: MyImage, *args, workers: int = None,
+              bands: int = None, **kwargs) -> MyImage:
+    """Returns operation(src, *args, **kwargs) computed in parallel.
+
+    operation is one of apply_mask, apply_lut, box_blur, remove_channel,
+    resize or rotations from image_operations. src is copied once into
+    shared memory and split into horizontal bands of rows. Each band,
+    together with the halo rows the operation reads around it (the mask
+    radius for masks, one row for resize), is handed to a worker process as a
+    packed image over the shared memory. The worker writes its rows of the
+    result straight into a second shared buffer, from which the result is
+    copied out in one go.
+    rotations reads the whole source and is split along the rows of the
+    result instead.
+
+    The result is a packed image, so channel values are clamped to [0, 255]
+    as they are when an image is saved.
+
+    Args:
+    - operation: the image operation to run
+    - src: the image to run it on
+    - args, kwargs: further arguments of the operation
+    - workers: the number of processes, os.cpu_count() by default
+    - bands: the number of bands, twice the number of workers by default
+
+    Returns:
+    the result of the operation.
+    """
+    name = operation.__name__
+    assert name in _GEOMETRY, f'{name} cannot be run in tiles'
+    workers = workers or os.cpu_count()
+    width, height = src.size
+    scale, halo = _GEOMETRY[name](*args, **kwargs)
+    if name == 'rotations':
+        assert width == height, 'rotations needs a square image'
+        rows = 2 * height                       # split the result, not src
+    else:
+        rows = height
+    dst_size = (width * scale, height * scale)
+
+    src_shm = SharedMemory(create=True, size=max(3 * width * height, 1))
+    dst_shm = SharedMemory(create=True, size=max(3 * dst_size[0] * dst_size[1], 1))
+    try:
+        src_shm.buf[:3 * width * height] = src.pixels.tobytes()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_band, name, args, kwargs,
+                                       src_shm.name, src.size, band, halo,
+                                       scale, dst_shm.name)
+                       for band in _split(rows, bands or 2 * workers)]
+            for future in futures:
+                future.result()
+        dst = MyImage(dst_size, packed=True)
+        dst.pixels.data[:] = dst_shm.buf[:len(dst.pixels.data)]
+        return dst
+    finally:
+        for shm in (src_shm, dst_shm):
+            shm.close()
+            shm.unlink()
+
+
+def _mask_geometry(maskfile, average: bool = True, size: (int, int) = None) -> (int, (int, int)):
+    """Returns the scale and the (above, below) halo rows of apply_mask."""
+    assert size is None, 'apply_mask cannot be run in tiles at another size'
+    return 1, image_operations._read_mask(maskfile).halo
+
+
+def _resize_geometry(size: (int, int) = None) -> (int, (int, int)):
+    """Returns the scale and the (above, below) halo rows of resize."""
+    assert size is None, 'resize cannot be run in tiles to another size'
+    return 2, (0, 1)
+
+
+def _box_geometry(n: int, average: bool = True) -> (int, (int, int)):
+    """Returns the scale and the (above, below) halo rows of box_blur."""
+    return 1, (n // 2, n - 1 - n // 2)
+
+
+# Maps the name of each supported operation to a function of its arguments
+# returning how many times larger the result is and the halo rows it needs.
+_GEOMETRY = {
+    'apply_mask': _mask_geometry,
+    'apply_lut': lambda *args, **kwargs: (1, (0, 0)),
+    'box_blur': _box_geometry,
+    'remove_channel': lambda *args, **kwargs: (1, (0, 0)),
+    'resize': _resize_geometry,
+    'rotations': lambda: (2, (0, 0)),
+}
+
+
+def _split(rows: int, bands: int) -> [(int, int)]:
+    """Returns up to bands nonempty (start, stop) ranges covering rows."""
+    bands = max(1, min(bands, rows))
+    return [(rows * i // bands, rows * (i + 1) // bands) for i in range(bands)]
+
+
+def _run_band(name: str, args: tuple, kwargs: dict, src_name: str,
+              size: (int, int), band: (int, int), halo: (int, int),
+              scale: int, dst_name: str) -> None:
+    """Worker: computes the result rows of band and writes them to dst_name.
+
+    For every operation but rotations, band is a range of source rows and
+    the operation runs on those rows plus their halo.
+    """
+    width, height = size
+    start, stop = band
+    src_shm = SharedMemory(name=src_name)
+    dst_shm = SharedMemory(name=dst_name)
+    try:
+        if name == 'rotations':
+            _rotations_band(src_shm.buf, width, dst_shm.buf, start, stop)
+            return
+        top, bottom = max(start - halo[0], 0), min(stop + halo[1], height)
+        rows = src_shm.buf[3 * width * top:3 * width * bottom]
+        result = getattr(image_operations, name)(
+            MyImage((width, bottom - top), data=rows), *args, **kwargs)
+        row_bytes = 3 * width * scale * scale   # bytes per source row
+        data = result.pixels.tobytes()
+        dst_shm.buf[row_bytes * start:row_bytes * stop] =\
+            data[row_bytes * (start - top):row_bytes * (stop - top)]
+        del rows, data, result                  # release views of the buffers
+    finally:
+        src_shm.close()
+        dst_shm.close()
+
+
+def _rotations_band(src, n: int, dst, start: int, stop: int) -> None:
+    """Writes rows start to stop - 1 of rotations() of an n by n image.
+
+    src and dst hold packed pixels. Every result row is assembled from a row
+    or a column of src with strided byte slices.
+    """
+    src = src[:3 * n * n]
+    for row in range(start, stop):
+        line = bytearray(6 * n)
+        if row < n:
+            # rotated 90 degrees anticlockwise, then the original
+            column = n - 1 - row
+            for k in range(3):
+                line[k:3 * n:3] = src[3 * column + k::3 * n]
+            line[3 * n:] = src[3 * n * row:3 * n * (row + 1)]
+        else:
+            # upside down, then rotated 270 degrees anticlockwise
+            source = src[3 * n * (2 * n - 1 - row):3 * n * (2 * n - row)]
+            column = row - n
+            for k in range(3):
+                line[k:3 * n:3] = source[k::3][::-1]
+                line[3 * n + k::3] = src[3 * column + k::3 * n][::-1]
+        dst[6 * n * row:6 * n * (row + 1)] = line
@@ -0,0 +1,125 @@
+from src.myimage import MyImage
+from src.mask import Mask
+from src import image_operations
+from src.image_operations import np
+
+
+class Pipeline:
+    """Records a chain of image operations on a source image and runs it lazily.
+
+    Each operation method returns the pipeline so calls can be chained, e.g.
+
+        Pipeline(img).remove_channel(blue=True)\\
+            .apply_mask('masks/mask-blur.txt').resize().run()
+
+    Nothing is computed until run(). With NumPy installed, run() works on
+    whole arrays and avoids intermediate images: channel suppression is kept
+    as a per-channel multiplier and folded into the grayscale conversion of
+    the next mask, or into the final image; a mask result stays a single
+    grayscale plane through resize, resample and rotations instead of being
+    written into three channels. Values are clamped to [0, 255] after every
+    step if the source is packed, as each intermediate packed image would
+    be, and otherwise only when the result is materialized. The result is
+    the same as calling the operations one after another. Without NumPy,
+    run() does exactly that.
+    """
+
+    def __init__(self, src: MyImage) -> None:
+        """Starts an empty pipeline on src.
+
+        Args:
+        - src: the image the operations are applied to. It is not modified.
+        """
+        self.src = src
+        self.steps: [(str, tuple)] = []
+
+    def remove_channel(self, red: bool = False, green: bool = False, blue: bool = False) -> 'Pipeline':
+        """Records remove_channel(), see image_operations."""
+        self.steps.append(('remove_channel', (red, green, blue)))
+        return self
+
+    def apply_mask(self, maskfile, average: bool = True) -> 'Pipeline':
+        """Records apply_mask(), see image_operations."""
+        self.steps.append(('apply_mask', (maskfile, average)))
+        return self
+
+    def box_blur(self, n: int, average: bool = True) -> 'Pipeline':
+        """Records box_blur(), see image_operations."""
+        self.steps.append(('box_blur', (n, average)))
+        return self
+
+    def resize(self) -> 'Pipeline':
+        """Records resize(), see image_operations."""
+        self.steps.append(('resize', ()))
+        return self
+
+    def resample(self, size: (int, int), method: str = 'bilinear') -> 'Pipeline':
+        """Records resample(), see image_operations."""
+        self.steps.append(('resample', (size, method)))
+        return self
+
+    def rotations(self) -> 'Pipeline':
+        """Records rotations(), see image_operations."""
+        self.steps.append(('rotations', ()))
+        return self
+
+    def run(self, packed: bool = None) -> MyImage:
+        """Runs the recorded operations and returns the resulting image.
+
+        Args:
+        - packed: whether the result uses packed storage, like the source
+          image by default
+
+        Returns:
+        the image resulting from the operations.
+        """
+        if packed is None:
+            packed = self.src.packed
+        if np is None:
+            img = self.src
+            for name, args in self.steps:
+                img = getattr(image_operations, name)(img, *args)
+            if img.packed != packed:
+                img = MyImage.from_pil(img.to_pil(), packed=packed)
+            return img
+
+        # pixels is either a (height, width, 3) array or a (height, width)
+        # grayscale plane standing for three equal channels. keep holds the
+        # pending channel multipliers.
+        pixels = image_operations._pixels_numpy(self.src)
+        keep = np.ones(3, dtype=np.int64)
+        for name, args in self.steps:
+            if name == 'remove_channel':
+                keep *= image_operations._kept_channels(*args)
+            elif name in ('apply_mask', 'box_blur'):
+                if name == 'apply_mask':
+                    mask = image_operations._read_mask(args[0])
+                else:
+                    mask = Mask(args[0], [1] * args[0] ** 2)
+                pixels = image_operations._mask_plane(_gray(pixels, keep), mask, args[1])
+                keep = np.ones(3, dtype=np.int64)
+            elif name == 'resize':
+                pixels = image_operations._resize_array(pixels.astype(np.int64))
+            elif name == 'resample':
+                (width, height), method = args
+                taps = image_operations._TAPS[method]
+                pixels = image_operations._resample_array(
+                    pixels, taps(pixels.shape[1], width), taps(pixels.shape[0], height))
+            elif name == 'rotations':
+                pixels = image_operations._rotations_array(pixels)
+            if self.src.packed and name != 'remove_channel':
+                # as the packed image this step would produce eagerly
+                pixels = np.clip(pixels, 0, 255)
+
+        if keep.all():
+            return MyImage.from_array(pixels, packed=packed)
+        if pixels.ndim == 2:
+            pixels = pixels[:, :, np.newaxis]
+        return MyImage.from_array(pixels * keep, packed=packed)
+
+
+def _gray(pixels, keep):
+    """Returns the (r + g + b) // 3 plane of pixels with keep applied."""
+    if pixels.ndim == 2:
+        return pixels.astype(np.int64) * int(keep.sum()) // 3
+    return (pixels.astype(np.int64) @ keep) // 3
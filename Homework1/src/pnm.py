@@ -0,0 +1,166 @@
+"""Reading and writing of Netpbm (PNM) images a strip of rows at a time, and
+memory mapping of raw ones.
+
+Supports 8-bit grayscale (P2, P5) and RGB (P3, P6) images, in plain (ASCII)
+and raw (binary) form, like images/feep.ppm. Rows are returned and written as
+interleaved RGB bytes, the layout of PackedArrayList.
+"""
+from itertools import islice
+import mmap
+
+
+# Channels per pixel and whether the pixel data is raw, by magic number.
+FORMATS = {b'P2': (1, False), b'P3': (3, False), b'P5': (1, True), b'P6': (3, True)}
+
+
+def read_header(file) -> (bytes, int, int, int):
+    """Reads the header of the PNM image in binary file.
+
+    On return, file is positioned at the first byte of pixel data.
+
+    Args:
+    - file: a file opened for binary reading
+
+    Returns:
+    a tuple of the magic number, width, height and maximum value.
+    """
+    fields = []
+    while len(fields) < 4:
+        token = b''
+        byte = file.read(1)
+        while byte:
+            if byte == b'#':                    # comments run to the end of the line
+                file.readline()
+            elif byte.isspace():
+                if token:
+                    break
+            else:
+                token += byte
+            byte = file.read(1)
+        assert token, f'Truncated PNM header in {file.name}'
+        fields.append(token)
+    magic, width, height, maxval = fields[0], *map(int, fields[1:])
+    assert magic in FORMATS, f'Unsupported PNM format {magic!r} in {file.name}'
+    assert 0 < maxval < 256, f'Only 8-bit PNM images are supported, not {maxval}'
+    return magic, width, height, maxval
+
+
+# mmap access by mode: read-only, write-through and copy-on-write.
+ACCESS = {'r': mmap.ACCESS_READ, 'r+': mmap.ACCESS_WRITE, 'c': mmap.ACCESS_COPY}
+
+
+def map_pixels(path: str, mode: str = 'r') -> (bytes, (int, int), memoryview, mmap.mmap, int):
+    """Memory maps the pixel data of the raw 8-bit PNM (P5 or P6) image at path.
+
+    Args:
+    - path: path to the image file
+    - mode: 'r' maps the file read-only, 'r+' writes changes through to the
+      file and 'c' keeps changes private (copy-on-write)
+
+    Returns:
+    a tuple of the magic number, the (width, height) size, a memoryview of
+    the pixel bytes, the mmap holding them and their offset in it.
+    """
+    assert mode in ACCESS, f'Invalid mapping mode {mode!r}'
+    with open(path, 'r+b' if mode == 'r+' else 'rb') as file:
+        magic, width, height, maxval = read_header(file)
+        channels, raw = FORMATS[magic]
+        assert raw and maxval == 255,\
+            f'Only raw PNM images with 255 as maximum can be mapped, not {path}'
+        offset = file.tell()
+        pixels = mmap.mmap(file.fileno(), 0, access=ACCESS[mode])
+    size = width * height * channels
+    assert len(pixels) >= offset + size, f'Truncated pixel data in {path}'
+    return magic, (width, height), memoryview(pixels)[offset:offset + size], pixels, offset
+
+
+class PNMReader:
+    """Reads a PNM image from a file in strips of rows.
+
+    The width, height and size attributes give the dimensions of the image.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Opens the PNM image at path and reads its header.
+
+        Args:
+        - path: path to the image file
+        """
+        self.file = open(path, 'rb')
+        self.magic, width, height, maxval = read_header(self.file)
+        self.width, self.height = self.size = (width, height)
+        self.channels, self.raw = FORMATS[self.magic]
+        # Scales values to the full byte range if the maximum is not 255.
+        self.scale = None
+        if maxval != 255:
+            self.scale = bytes(min(v * 255 // maxval, 255) for v in range(256))
+        if not self.raw:
+            self.values = (int(token) for line in self.file
+                           for token in line.split(b'#')[0].split())
+
+    def read_rows(self, count: int) -> bytearray:
+        """Reads the next count rows of the image.
+
+        Args:
+        - count: the number of rows to read
+
+        Returns:
+        the rows as interleaved RGB bytes.
+        """
+        size = self.width * count * self.channels
+        if self.raw:
+            data = self.file.read(size)
+        else:
+            data = bytes(islice(self.values, size))
+        assert len(data) == size, f'Truncated pixel data in {self.file.name}'
+        if self.scale:
+            data = data.translate(self.scale)
+        if self.channels == 1:
+            rgb = bytearray(3 * len(data))
+            for k in range(3):
+                rgb[k::3] = data
+            return rgb
+        return bytearray(data)
+
+    def close(self) -> None:
+        """Closes the file."""
+        self.file.close()
+
+    def __enter__(self) -> 'PNMReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PNMWriter:
+    """Writes a raw RGB (P6) image to a file in strips of rows."""
+
+    def __init__(self, path: str, size: (int, int)) -> None:
+        """Creates the file at path and writes the header for an image of size.
+
+        Args:
+        - path: path to the image file
+        - size: (width, height) of the image
+        """
+        self.size = size
+        self.file = open(path, 'wb')
+        self.file.write(b'P6\n%d %d\n255\n' % size)
+
+    def write_rows(self, data) -> None:
+        """Appends rows of interleaved RGB bytes to the image.
+
+        Args:
+        - data: the rows to write
+        """
+        self.file.write(data)
+
+    def close(self) -> None:
+        """Closes the file."""
+        self.file.close()
+
+    def __enter__(self) -> 'PNMWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
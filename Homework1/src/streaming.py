@@ -0,0 +1,88 @@
+from collections import deque
+
+from src.myimage import MyImage
+from src import image_operations
+from src.pnm import PNMReader, PNMWriter
+
+
+def stream_apply_mask(src_path: str, dst_path: str, maskfile, average: bool = True,
+                      strip: int = 16) -> None:
+    """Applies the mask from maskfile to the PNM image at src_path, writing
+    the result to dst_path as a raw PPM, without loading the whole image.
+
+    The result is that of apply_mask() on the whole image, clamped to bytes
+    as when saving. See stream() for the memory used.
+
+    Args:
+    - src_path: path to the PNM source image
+    - dst_path: path to write the result to
+    - maskfile: path to a file specifying the mask to be applied, or a Mask
+    - average: if True, averaging should to done when applying the mask
+    - strip: the number of rows computed at a time
+
+    Returns:
+    none
+    """
+    mask = image_operations._read_mask(maskfile)   # read once, not once per strip
+    stream(src_path, dst_path, image_operations.apply_mask, (mask, average),
+           halo=mask.halo, strip=strip)
+
+
+def stream_remove_channel(src_path: str, dst_path: str, red: bool = False, green: bool = False,
+                          blue: bool = False, strip: int = 16) -> None:
+    """Suppresses the indicated channels of the PNM image at src_path, writing
+    the result to dst_path as a raw PPM, without loading the whole image.
+
+    See remove_channel() for the channels suppressed.
+
+    Args:
+    - src_path: path to the PNM source image
+    - dst_path: path to write the result to
+    - red, green, blue: the channels to suppress
+    - strip: the number of rows computed at a time
+
+    Returns:
+    none
+    """
+    stream(src_path, dst_path, image_operations.remove_channel, (red, green, blue),
+           strip=strip)
+
+
+def stream(src_path: str, dst_path: str, operation, args: tuple = (),
+           halo: (int, int) = (0, 0), strip: int = 16) -> None:
+    """Runs a row-local image operation over the PNM image at src_path strip
+    by strip, writing each strip of the result to dst_path as it is computed.
+
+    Source rows are kept in a ring buffer holding one strip plus the halo
+    rows the operation reads above and below it. operation runs on that band
+    as a packed image and the rows of the strip are cut out of its result, so
+    at most width * (strip + halo rows) pixels are held at a time.
+
+    Args:
+    - src_path: path to the PNM source image
+    - dst_path: path to write the raw PPM result to
+    - operation: the image operation, returning an image of the same size
+    - args: further arguments of the operation
+    - halo: the number of rows above and below a pixel the operation reads
+    - strip: the number of rows computed at a time
+
+    Returns:
+    none
+    """
+    above, below = halo
+    with PNMReader(src_path) as reader, PNMWriter(dst_path, reader.size) as writer:
+        width, height = reader.size
+        row_bytes = 3 * width
+        rows = deque(maxlen=above + strip + below)
+        read = 0                                # source rows read so far
+        for start in range(0, height, strip):
+            stop = min(start + strip, height)
+            need = min(stop + below, height)
+            if need > read:
+                data = reader.read_rows(need - read)
+                rows.extend(data[i:i + row_bytes] for i in range(0, len(data), row_bytes))
+                read = need
+            first = read - len(rows)            # source row held in rows[0]
+            band = MyImage((width, len(rows)), data=bytearray().join(rows))
+            result = operation(band, *args).pixels.tobytes()
+            writer.write_rows(result[row_bytes * (start - first):row_bytes * (stop - first)])
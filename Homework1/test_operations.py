@@ -0,0 +1,517 @@
+import glob
+import math
+import random
+import weakref
+
+import pytest
+from src.grayimage import GrayImage
+from src.mask import Mask
+from src.myimage import MyImage
+from src import image_operations
+from src.image_operations import *
+from src.parallel import run_tiled
+
+MASKS = sorted(glob.glob('masks/*.txt'))
+
+
+def random_image(size: (int, int), packed: bool = False, seed: int = 201) -> MyImage:
+    rand = random.Random(seed)
+    width, height = size
+    img = MyImage(size, packed=packed)
+    for r in range(height):
+        for c in range(width):
+            img.set(r, c, (rand.randrange(256), rand.randrange(256),
+                           rand.randrange(256)))
+    return img
+
+
+def numpy_engine(engine, src: MyImage, *args) -> MyImage:
+    gray = image_operations._gray_numpy(src)
+    return MyImage.from_array(engine(gray, *args), packed=src.packed)
+
+
+@pytest.mark.parametrize('packed', [False, True])
+@pytest.mark.parametrize('numpy', [True, False])
+def test_histogram_statistics_lut(monkeypatch, packed, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(image_operations, 'np', None)
+    src = random_image((7, 6), packed=packed)
+    pixels = list(src.pixels)
+    for k, (counts, stats) in enumerate(zip(histogram(src), statistics(src))):
+        values = [pixel[k] for pixel in pixels]
+        assert counts == [values.count(v) for v in range(256)]
+        assert stats == (min(values), max(values), sum(values) / len(values))
+    invert = [255 - v for v in range(256)]
+    remapped = apply_lut(src, invert, None, ZERO_LUT)
+    assert remapped.packed == packed
+    assert list(remapped.pixels) == [(255 - r, g, 0) for r, g, b in pixels]
+    gray = apply_mask(src, 'masks/mask-blur.txt')
+    assert isinstance(apply_lut(gray, invert, invert, invert), GrayImage)
+    assert histogram(gray)[0] == histogram(gray.to_rgb())[2]
+
+
+@pytest.mark.parametrize('maskfile', MASKS)
+@pytest.mark.parametrize('average', [True, False])
+def test_numpy_mask_matches_python(maskfile, average):
+    pytest.importorskip('numpy')
+    mask = Mask.load(maskfile)
+    for size in [(1, 1), (2, 3), (13, 9)]:
+        src = random_image(size)
+        expected = image_operations._apply_mask_python(src, mask, average)
+        actual = numpy_engine(image_operations._convolve_plane, src, mask, average)
+        assert list(actual.pixels) == list(expected.pixels),\
+            f'{maskfile} on {size} image, average={average}'
+        # Chaining feeds unclamped averages back in.
+        expected = image_operations._apply_mask_python(expected, mask, True)
+        actual = numpy_engine(image_operations._convolve_plane, actual, mask, True)
+        assert list(actual.pixels) == list(expected.pixels)
+
+
+def test_separate():
+    assert Mask(3, [-1, 0, 1, -2, 0, 2, -1, 0, 1]).kernels == ([1, 2, 1], [-1, 0, 1])
+    assert Mask(2, [0, 0, -2, 4]).kernels == ([0, 2], [-1, 2])
+    assert Mask(3, [1, 3, 1, 3, 5, 3, 1, 3, 1]).kernels is None
+    assert Mask(2, [0, 0, 0, 0]).kernels is None
+
+
+def test_mask():
+    mask = Mask(4, list(range(16)))
+    assert (mask.origin, mask.halo, mask.total) == (2, (2, 1), 120)
+    assert mask.taps[0] == (-2, -1, 1) and len(mask.taps) == 15
+    assert mask.offsets(10)[0] == (-21, 1)
+    assert mask.interior((10, 6)) == (2, 5, 2, 9)
+    assert mask.interior((2, 2)) == (2, 2, 2, 2)
+    assert not mask.symmetric and Mask(3, [1, 3, 1, 3, 5, 3, 1, 3, 1]).symmetric
+    assert Mask(2, [3] * 4).is_box(True) and not Mask(2, [3] * 4).is_box(False)
+    # A loaded mask is reusable across images and gives the same result as its file.
+    blur = Mask.load('masks/mask-blur.txt')
+    for seed in range(3):
+        src = random_image((7, 5), seed=seed)
+        assert list(apply_mask(src, blur).pixels) ==\
+            list(apply_mask(src, 'masks/mask-blur.txt').pixels)
+
+
+@pytest.mark.parametrize('maskfile', MASKS)
+@pytest.mark.parametrize('average', [True, False])
+def test_separable_mask_matches_python(maskfile, average):
+    mask = Mask.load(maskfile)
+    kernels = mask.kernels
+    if kernels is None:
+        pytest.skip(f'{maskfile} is not separable')
+    for size in [(1, 1), (2, 3), (13, 9)]:
+        src = random_image(size)
+        expected = image_operations._apply_mask_python(src, mask, average)
+        actual = image_operations._apply_separable_python(src, *kernels, average)
+        assert list(actual.pixels) == list(expected.pixels)
+        if image_operations.np is not None:
+            actual = numpy_engine(image_operations._separable_plane, src, *kernels, average)
+            assert list(actual.pixels) == list(expected.pixels)
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 4, 7])
+@pytest.mark.parametrize('average', [True, False])
+@pytest.mark.parametrize('numpy', [True, False])
+def test_box_blur_matches_mask(monkeypatch, n, average, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(image_operations, 'np', None)
+    for size in [(1, 1), (2, 3), (13, 9)]:
+        src = random_image(size)
+        expected = image_operations._apply_mask_python(src, Mask(n, [1] * n * n), average)
+        assert list(box_blur(src, n, average).pixels) == list(expected.pixels)
+
+
+def white_through_buffer(img):
+    img.buffer().cast('B')[18:21] = b'\xff\xff\xff'
+
+
+def white_through_frombytes(img):
+    data = bytearray(img.pixels.tobytes())
+    data[18:21] = b'\xff\xff\xff'
+    img.pixels.frombytes(data)
+
+
+def white_through_row(img):
+    for channel in img.get_row(1):
+        channel[1] = 255
+
+
+@pytest.mark.parametrize('packed', [False, True])
+@pytest.mark.parametrize('write', [
+    lambda img: img.set(1, 1, (255, 255, 255)),
+    lambda img: img.pixels.__setitem__(6, (255, 255, 255)),
+    white_through_frombytes,
+    white_through_buffer,
+    white_through_row])
+def test_box_blur_integral_cache(packed, write):
+    if write is white_through_buffer and not packed:
+        pytest.skip('only packed images have a buffer')
+    src = random_image((5, 4), packed=packed)
+    view = src.get_row(1)                       # views taken before the table is cached
+    box_blur(src, 3)
+    if write is white_through_row:
+        for channel in view:
+            channel[1] = 255
+    else:
+        write(src)
+    assert src.get(1, 1) == (255, 255, 255)
+    expected = image_operations._apply_mask_python(src, Mask(3, [1] * 9), True)
+    assert list(box_blur(src, 3).pixels) == list(expected.pixels)
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_edge_detect(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(image_operations, 'np', None)
+    sobel_x, sobel_y = Mask.load('masks/mask-sobel-x.txt'), Mask.load('masks/mask-sobel-y.txt')
+    for size in [(1, 1), (2, 3), (13, 9)]:
+        src = random_image(size)
+        width, height = size
+        gray = [[sum(src.get(x, y)) // 3 for y in range(width)] for x in range(height)]
+
+        def gradient(mask, x, y):
+            return sum(gray[x + i][y + j] * value for i, j, value in mask.taps
+                       if 0 <= x + i < height and 0 <= y + j < width)
+
+        magnitude, angle = edge_detect(src, direction=True)
+        assert list(edge_detect(src).pixels) == list(magnitude.pixels)
+        for x in range(height):
+            for y in range(width):
+                gx, gy = gradient(sobel_x, x, y), gradient(sobel_y, x, y)
+                assert magnitude.get(x, y)[0] == min(int((gx * gx + gy * gy) ** 0.5), 255)
+                assert angle.get(x, y)[0] == round(math.degrees(math.atan2(gy, gx))) % 180
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_edge_detect_steps(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(image_operations, 'np', None)
+    # a vertical edge, dark on the left
+    vertical = GrayImage((4, 3), data=[0, 0, 20, 20] * 3)
+    magnitude, angle = edge_detect(vertical, direction=True)
+    assert [magnitude.get(1, y)[0] for y in range(4)] == [0, 80, 80, 80]
+    assert [angle.get(1, y)[0] for y in range(4)] == [0, 0, 0, 0]
+    # a horizontal edge, dark at the top
+    horizontal = GrayImage((3, 4), data=[0] * 6 + [20] * 6)
+    magnitude, angle = edge_detect(horizontal, direction=True)
+    assert [magnitude.get(x, 1)[0] for x in range(4)] == [0, 80, 80, 80]
+    assert [angle.get(x, 1)[0] for x in range(4)] == [0, 90, 90, 90]
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_edge_detect_engines_agree(monkeypatch, packed):
+    pytest.importorskip('numpy')
+    src = random_image((11, 8), packed=packed)
+    expected = [img.pixels.tobytes() for img in edge_detect(src, direction=True)]
+    monkeypatch.setattr(image_operations, 'np', None)
+    actual = [img.pixels.tobytes() for img in edge_detect(src, direction=True)]
+    assert actual == expected
+
+
+@pytest.mark.parametrize('packed', [False, True])
+@pytest.mark.parametrize('numpy', [True, False])
+def test_gray_image(monkeypatch, tmp_path, packed, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(image_operations, 'np', None)
+    src = random_image((6, 5), packed=packed)
+    blurred = apply_mask(src, 'masks/mask-blur.txt')
+    assert isinstance(blurred, GrayImage) and blurred.packed == packed
+    assert blurred.pixels.data.typecode == 'B' and blurred.nbytes == 30
+    assert blurred._cache == {} and blurred._mapped is None
+    # Averaging a mask with negative weights leaves values outside a byte.
+    edges = apply_mask(src, Mask(3, [-1, -1, -1, -1, 9, -1, -1, -1, -1]))
+    values = [value for value, _, _ in edges.pixels]
+    assert all(0 <= value <= 255 for value in values) if packed else\
+        edges.pixels.data.typecode == 'i' and min(values) < 0
+    rgb = edges.to_rgb()
+    assert not isinstance(rgb, GrayImage) and list(rgb.pixels) == list(edges.pixels)
+    edges.save(tmp_path / 'gray.png')
+    rgb.save(tmp_path / 'rgb.png')
+    assert list(MyImage.open(tmp_path / 'gray.png').pixels) ==\
+        list(MyImage.open(tmp_path / 'rgb.png').pixels)
+    square = apply_mask(random_image((4, 4), packed=packed), 'masks/mask-blur.txt')
+    assert list(rotations(square).pixels) == list(rotations(square.to_rgb()).pixels)
+    assert list(edges.rotate(1).pixels) == list(rgb.rotate(1).pixels)
+    for scaled, expected in [(resize(blurred), resize(blurred.to_rgb())),
+                             (resample(blurred, (4, 7)), resample(blurred.to_rgb(), (4, 7)))]:
+        assert isinstance(scaled, GrayImage) and scaled.packed == packed
+        assert list(scaled.pixels) == list(expected.pixels)
+
+
+def test_run_tiled_matches_serial():
+    src = random_image((12, 12), packed=True)
+    cases = [(apply_mask, ('masks/mask-blur.txt',), {}),
+             (apply_mask, ('masks/mask-sobel-y.txt', False), {}),
+             (box_blur, (4,), {}),
+             (remove_channel, (), {'blue': True}),
+             (resize, (), {}),
+             (rotations, (), {})]
+    for operation, args, kwargs in cases:
+        expected = operation(src, *args, **kwargs)
+        actual = run_tiled(operation, src, *args, workers=2, bands=5, **kwargs)
+        assert actual.size == expected.size
+        assert actual.pixels.tobytes() == expected.pixels.tobytes(), operation.__name__
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_pipeline_matches_eager(packed):
+    from src.pipeline import Pipeline
+    src = random_image((9, 9), packed=packed)
+    chains = [[('remove_channel', (False, False, True)),
+               ('apply_mask', ('masks/mask-blur.txt', True)),
+               ('resize', ())],
+              [('apply_mask', ('masks/mask-sobel-x.txt', True)),
+               ('remove_channel', (False, True, False)),
+               ('rotations', ()),
+               ('resample', ((11, 7), 'box')),
+               ('box_blur', (4, False))],
+              [('remove_channel', (True, False, False)),
+               ('resize', ()),
+               ('apply_mask', ('masks/mask-sobel-y.txt', False))],
+              [('apply_mask', (Mask(3, [-1, -1, -1, -1, 9, -1, -1, -1, -1]), True)),
+               ('apply_mask', ('masks/mask-blur.txt', True)),
+               ('rotations', ()),
+               ('resample', ((5, 6), 'bilinear')),
+               ('apply_mask', ('masks/mask-sobel-y.txt', True))]]
+    for chain in chains:
+        expected = src
+        pipeline = Pipeline(src)
+        for name, args in chain:
+            expected = getattr(image_operations, name)(expected, *args)
+            getattr(pipeline, name)(*args)
+        assert list(pipeline.run().pixels) == list(expected.pixels), chain
+
+
+def test_stream_apply_mask_matches_apply_mask(tmp_path):
+    from src.pnm import PNMReader, PNMWriter
+    from src.streaming import stream_apply_mask
+    src = random_image((7, 11), packed=True)
+    with PNMWriter(tmp_path / 'src.ppm', src.size) as writer:
+        writer.write_rows(src.pixels.data)
+    for maskfile in MASKS:
+        stream_apply_mask(tmp_path / 'src.ppm', tmp_path / 'dst.ppm', maskfile, strip=3)
+        with PNMReader(tmp_path / 'dst.ppm') as reader:
+            assert reader.size == src.size
+            assert reader.read_rows(11) == apply_mask(src, maskfile).pixels.tobytes()
+
+
+def test_buffer():
+    src = random_image((4, 3), packed=True)
+    view = src.pixels.buffer()
+    view[3:6] = bytes((7, 8, 9))
+    assert src.get(0, 1) == (7, 8, 9)
+    assert src.buffer().shape == (3, 4, 3) and src.buffer().tolist()[0][1] == [7, 8, 9]
+    gray = GrayImage((4, 3), data=list(range(12)))
+    assert gray.pixels.buffer().tolist() == list(range(12))
+
+
+def test_tobytes_clamps():
+    src = random_image((4, 3))
+    expected = bytes(src.pixels.tobytes())
+    assert expected == bytes(v for pixel in src.pixels for v in pixel)
+    src.set(0, 1, (-5, 300, 7))
+    assert src.pixels.tobytes()[3:6] == bytes((0, 255, 7))
+    src.set(0, 1, (1, 2, 3))
+    assert src.pixels.tobytes()[3:6] == bytes((1, 2, 3))
+    src.pixels[2:4] = [(256, 0, 0), (0, -1, 0)]
+    assert src.pixels.tobytes()[6:12] == bytes((255, 0, 0, 0, 0, 0))
+    src.pixels.frombytes(expected)
+    assert src.pixels.tobytes() == expected
+    src.get_row(2)[1][0] = 1000
+    assert src.pixels.tobytes()[25] == 255
+
+
+def test_open_mapped(tmp_path):
+    src = random_image((6, 4), packed=True)
+    src.save(tmp_path / 'src.ppm')
+    img = MyImage.open_mapped(tmp_path / 'src.ppm', 'r+')
+    assert img.size == src.size and img.pixels.data == src.pixels.data
+    img.set(3, 5, (1, 2, 3))
+    img.save(tmp_path / 'src.ppm')
+    img.close()
+    assert MyImage.open(tmp_path / 'src.ppm').get(3, 5) == (1, 2, 3)
+    for mode in ('r', 'c'):                     # saved onto the mapped file
+        img = MyImage.open_mapped(tmp_path / 'src.ppm', mode)
+        if mode == 'c':
+            img.set(0, 0, (4, 5, 6))
+        img.save(tmp_path / 'src.ppm')
+        assert img.get(3, 5) == (1, 2, 3)
+        img.close()
+    assert MyImage.open(tmp_path / 'src.ppm').get(0, 0) == (4, 5, 6)
+    # P5 images are mapped as gray images
+    (tmp_path / 'gray.pgm').write_bytes(b'P5\n4 3\n255\n' + bytes(range(12)))
+    gray = MyImage.open_mapped(tmp_path / 'gray.pgm', 'r+')
+    assert isinstance(gray, GrayImage) and isinstance(gray.pixels.data, memoryview)
+    assert gray.get(2, 1) == (9, 9, 9)
+    gray.set(2, 1, (200, 200, 200))
+    gray.save(tmp_path / 'gray.pgm')
+    for table in (None, list(range(256))):      # results do not share the mapping
+        copy = apply_lut(gray, table, table, table)
+        assert isinstance(copy, GrayImage) and copy.get(2, 1) == (200, 200, 200)
+        copy.set(2, 1, (7, 7, 7))
+        assert gray.get(2, 1) == (200, 200, 200)
+    gray.close()
+    assert (tmp_path / 'gray.pgm').read_bytes()[-3] == 200
+    # closing fails while views are alive, leaving the image usable
+    img = MyImage.open_mapped(tmp_path / 'src.ppm', 'r+')
+    view = img.buffer()
+    with pytest.raises(BufferError):
+        img.close()
+    img.set(0, 0, (7, 8, 9))
+    assert img.get(0, 0) == (7, 8, 9) and view.cast('B')[:3].tolist() == [7, 8, 9]
+    del view
+    img.close()
+    assert MyImage.open(tmp_path / 'src.ppm').get(0, 0) == (7, 8, 9)
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_transforms(packed):
+    src = random_image((5, 3), packed=packed)
+    width, height = src.size
+    rotated = src.rotate(1)
+    assert rotated.size == (height, width)
+    assert all(rotated.get(width - 1 - c, r) == src.get(r, c)
+               for r in range(height) for c in range(width))
+    assert list(src.transpose().transpose().pixels) == list(src.pixels)
+    assert list(src.rotate(-1).pixels) == list(src.rotate(3).pixels)
+    assert list(src.flip_horizontal().pixels) ==\
+        list(src.rotate(2).flip_vertical().pixels)
+    canvas = MyImage((7, 6), packed=packed)
+    canvas.paste(src, 2, 1)
+    assert all(canvas.get(r + 2, c + 1) == src.get(r, c)
+               for r in range(height) for c in range(width))
+
+
+@pytest.mark.parametrize('packed', [False, True, 'gray'])
+def test_slices_and_rows(packed):
+    if packed == 'gray':
+        src = apply_mask(random_image((5, 4)), 'masks/mask-blur.txt')
+    else:
+        src = random_image((5, 4), packed=packed)
+    pixels = list(src.pixels)
+    for index in [slice(None), slice(3, 11), slice(2, 17, 3), slice(None, None, -2),
+                  slice(15, 2, -4), slice(7, 7)]:
+        assert src.pixels[index] == pixels[index]
+        copy = src.copy()
+        copy.pixels[index] = src.pixels[index][::-1]
+        expected = list(pixels)
+        expected[index] = pixels[index][::-1]
+        assert list(copy.pixels) == expected
+    # Iterators are independent of each other.
+    assert [(a, b) for a in src for b in src] == [(a, b) for a in pixels for b in pixels]
+
+    red, green, blue = src.get_row(2)
+    assert list(zip(red, green, blue)) == pixels[10:15]
+    dst = src.copy()
+    dst.set_row(0, src.get_row(3))
+    dst.set_row(3, [bytes(range(5))] * 3)
+    assert list(dst.pixels) == pixels[15:20] + pixels[5:15] + [(v, v, v) for v in range(5)]
+    if packed != 'gray':
+        view = dst.get_row(1)[1]
+        view[0] = 7
+        assert dst.get(1, 0) == (pixels[5][0], 7, pixels[5][2])
+
+
+@pytest.mark.parametrize('method', ['nearest', 'bilinear', 'box'])
+def test_resample(monkeypatch, method):
+    src = random_image((7, 5))
+    assert list(resample(src, (7, 5), method).pixels) == list(src.pixels)
+    for size in [(1, 1), (3, 9), (16, 4)]:
+        expected = resample(src, size, method)
+        assert expected.size == size
+        monkeypatch.setattr(image_operations, 'np', None)
+        assert list(resample(src, size, method).pixels) == list(expected.pixels)
+        monkeypatch.undo()
+
+
+def test_pyramid(monkeypatch):
+    src = random_image((9, 6), packed=True)
+    levels = pyramid(src)
+    assert [level.size for level in levels] == [(9, 6), (4, 3), (2, 1), (1, 1)]
+    assert pyramid(src)[1] is levels[1]
+    assert pyramid_level(src, (3, 2)) is levels[1]
+    assert list(resample(src, (2, 1), 'box', mipmap=True).pixels) ==\
+        list(resample(levels[1], (2, 1), 'box').pixels)
+    assert list(resize(src, (2, 1)).pixels) == list(resample(levels[1], (2, 1), 'box').pixels)
+    half = resize(src, (4, 3))
+    assert half is not levels[1] and list(half.pixels) == list(levels[1].pixels)
+    same = resize(src, src.size)
+    assert same is not src and list(same.pixels) == list(src.pixels)
+    half.set(0, 0, (255, 0, 0))
+    same.set(0, 0, (255, 0, 0))
+    assert pyramid(src)[1].get(0, 0) != (255, 0, 0) and src.get(0, 0) != (255, 0, 0)
+    assert apply_mask(src, 'masks/mask-blur.txt', size=(4, 3)).pixels.tobytes() ==\
+        apply_mask(levels[1], 'masks/mask-blur.txt').pixels.tobytes()
+    src.set(0, 0, (0, 0, 0))
+    assert pyramid(src)[1] is not levels[1]
+    monkeypatch.setattr(image_operations, 'PYRAMID_BUDGET', 0)
+    other = random_image((4, 4), packed=True)
+    pyramid(other)
+    assert 'pyramid' not in src._cache and 'pyramid' not in other._cache
+    monkeypatch.undo()
+    pyramid(other)
+    assert all(level is not other for level in other._cache['pyramid'][1])
+    ref = weakref.ref(other)
+    del other
+    assert ref() is None, 'a cached pyramid keeps its image alive'
+
+
+def test_result_cache(tmp_path):
+    from src.cache import ResultCache
+    src = random_image((6, 5))
+    mask = tmp_path / 'mask.txt'
+    mask.write_text('3\n-1\n0\n1\n-2\n0\n2\n-1\n0\n1\n')
+    cache = ResultCache(tmp_path / 'cache')
+    expected = apply_mask(src, mask)
+    assert list(cache.call(apply_mask, src, mask).pixels) == list(expected.pixels)
+    hit = cache.call(apply_mask, src, str(mask), average=True)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert list(hit.pixels) == list(expected.pixels)
+    cache.call(apply_mask, src, mask, False)
+    mask.write_text('3\n' + '1\n' * 9)
+    cache.call(apply_mask, src, mask)
+    assert (cache.hits, cache.misses) == (1, 3)
+    # a fresh cache finds the results on disk
+    cache = ResultCache(tmp_path / 'cache')
+    assert list(cache.wrap(apply_mask)(src, mask).pixels) == list(box_blur(src, 3).pixels)
+    assert (cache.hits, cache.misses) == (1, 0)
+    # results of every storage come back from disk as they were stored
+    for img in (src, random_image((6, 5), packed=True), expected,
+                apply_mask(random_image((6, 5), packed=True), mask)):
+        cache = ResultCache(tmp_path / 'storage')
+        cache.call(MyImage.copy, img)
+        result = ResultCache(tmp_path / 'storage').call(MyImage.copy, img)
+        assert type(result) is type(img) and result.packed == img.packed
+        assert list(result.pixels) == list(img.pixels)
+    # a file that is not a stored result is a miss
+    for path in (tmp_path / 'storage').iterdir():
+        path.write_bytes(b'not an image')
+    cache = ResultCache(tmp_path / 'storage')
+    assert list(cache.call(MyImage.copy, src).pixels) == list(src.pixels)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_run_batch(tmp_path):
+    from src.batch import parse_operation, run_batch
+    for seed, name in enumerate(['a.png', 'b.ppm']):
+        random_image((6 + seed, 5), seed=seed).save(tmp_path / name)
+    (tmp_path / 'notes.txt').write_text('not an image')
+    operations = [parse_operation('apply_mask:masks/mask-sobel-y.txt,False'),
+                  parse_operation('remove_channel:blue=True')]
+    assert operations[1] == ('remove_channel', (), {'blue': True})
+    stats = run_batch(tmp_path, tmp_path / 'out', operations, workers=2, extension='.png')
+    assert stats['images'] == 2 and not stats['failures']
+    for name in ['a', 'b']:
+        src = MyImage.open(next(tmp_path.glob(name + '.*')))
+        expected = remove_channel(apply_mask(src, 'masks/mask-sobel-y.txt', False), blue=True)
+        assert list(MyImage.open(tmp_path / 'out' / (name + '.png')).pixels) ==\
+            list(MyImage.from_pil(expected.to_pil()).pixels)
@@ -1,122 +1,296 @@
 import array
+import math
 
 class DynamicArrayList:
+    """A list stored at the front of an array('i'), with its length kept in n.
 
-    def __init__(self) -> None:
-        self.s = 1
-        self.array = array.array('i', [-1] * self.s)  # initialize the array with -1
+    When the array is full it grows to growth times the length, so appends
+    take amortized O(1) time. After a delete that leaves the array at least
+    shrink times longer than the list, it shrinks to growth times the length.
+    Elements are shifted with slice assignment, which moves the whole block
+    in C. Any int can be stored, -1 included.
+    """
+
+    def __init__(self, growth: float = 2, shrink: float = 3) -> None:
+        assert growth > 1 and shrink > growth,\
+            f'Need 1 < growth < shrink, not growth={growth}, shrink={shrink}'
+        self.growth = growth
+        self.shrink = shrink
+        self.n = 0                                      # number of elements
+        self.array = array.array('i', [-1])             # unused slots hold -1
 
     def insert(self, index : int , value) -> None:
-        # check if number of elements in array = size of array
-        n = 0                                   
-        while n < len(self.array) and self.array[n] != -1:
-            n += 1 
-
-        # resize if true 
-        if n == len(self.array):
-            self.s = 2 * n
-            arr = array.array('i', [-1] * self.s)
-            for i in range(n):
-                arr[i] = self.array[i]
-            self.array = arr   
-
-        # add element at index and shift the elements after it to the right
-        for i in range(n-1, index-1, -1):
-            self.array[i+1] = self.array[i]
+        n = self.n
+        assert 0 <= index <= n, f'Cannot insert at index {index} in list of size {n}'
+        if n == len(self.array):                        # full, grow
+            self._resize(max(n + 1, int(self.growth * n)))
+        # shift the elements from index on to the right and add value there
+        self.array[index + 1:n + 1] = self.array[index:n]
         self.array[index] = value
-
-        # print(self.array)
+        self.n = n + 1
 
     def delete(self, index : int) -> None:
-        # delete element and shift elements left
-        for i in range(index,self.s-1):
-            self.array[i] = self.array[i+1]
-        self.array[self.s-1] = -1    
-
-        # count number of elements
-        n = 0                                   
-        while n < len(self.array) and self.array[n] != -1:
-            n += 1
-
-        # if len >= 3n, reduce array to half size
-        if len(self.array) >= 3*n:
-            self.s = 2 * n
-            arr = array.array('i', [-1] * self.s)
-            for i in range(n):
-                arr[i] = self.array[i]
-            self.array = arr    
-
-        # print(self.array)    
+        n = self.n
+        assert 0 <= index < n, f'Cannot delete index {index} from list of size {n}'
+        # shift the elements after index to the left over it
+        self.array[index:n - 1] = self.array[index + 1:n]
+        self.array[n - 1] = -1
+        self.n = n - 1
+        if len(self.array) >= self.shrink * self.n:     # mostly empty, shrink
+            self._resize(int(self.growth * self.n))
 
     def get(self, index : int):
+        assert 0 <= index < self.n, f'Getting invalid index {index} from list of size {self.n}'
         return self.array[index]
 
     def size(self) -> int:
-        n = 0                                   
-        while n < len(self.array) and self.array[n] != -1:
-            n += 1 
-        return n    
+        return self.n
 
     def display(self) -> str:
-        val = []
-        for i in range(self.s):
-            val.append(self.array[i])
-        return val            
+        # the whole array, unused slots showing as -1
+        return self.array[:self.n].tolist() + [-1] * (len(self.array) - self.n)
+
+    def _resize(self, capacity: int) -> None:
+        arr = array.array('i', [-1]) * capacity
+        arr[:self.n] = self.array[:self.n]
+        self.array = arr
+
+class ArrayDeque:
+    """A list stored in a circular array('i'): index i is at
+    array[(head + i) % capacity].
+
+    Inserting or deleting at either end moves head or the end, so it takes
+    amortized O(1) time, as does get. In the middle, the shorter of the two
+    sides is shifted. The array doubles when full and halves when at most a
+    quarter full.
+    """
+
+    def __init__(self) -> None:
+        self.array = array.array('i', [0])
+        self.head = 0                                   # array index of element 0
+        self.n = 0                                      # number of elements
+
+    def insert(self, index : int , value) -> None:
+        n = self.n
+        assert 0 <= index <= n, f'Cannot insert at index {index} in list of size {n}'
+        if n == len(self.array):                        # full, grow
+            self._resize(2 * n)
+        if index < n - index:
+            # move head back and the elements before index to the left
+            self.head = (self.head - 1) % len(self.array)
+            self._shift(1, index + 1, -1)
+        else:
+            # move the elements from index on to the right
+            self._shift(index, n, 1)
+        self.array[(self.head + index) % len(self.array)] = value
+        self.n = n + 1
+
+    def delete(self, index : int) -> None:
+        n = self.n
+        assert 0 <= index < n, f'Cannot delete index {index} from list of size {n}'
+        if index < n - 1 - index:
+            # move the elements before index right over it, and head with them
+            self._shift(0, index, 1)
+            self.head = (self.head + 1) % len(self.array)
+        else:
+            # move the elements after index left over it
+            self._shift(index + 1, n, -1)
+        self.n = n - 1
+        if len(self.array) >= 4 * self.n and len(self.array) > 1:  # mostly empty, shrink
+            self._resize(max(1, 2 * self.n))
+
+    def get(self, index : int):
+        assert 0 <= index < self.n, f'Getting invalid index {index} from list of size {self.n}'
+        return self.array[(self.head + index) % len(self.array)]
+
+    def size(self) -> int:
+        return self.n
+
+    def display(self) -> list:
+        return self._values().tolist()
+
+    def _values(self) -> array.array:
+        """Returns the elements in order, unwrapped into a new array."""
+        end = self.head + self.n
+        if end <= len(self.array):
+            return self.array[self.head:end]
+        return self.array[self.head:] + self.array[:end - len(self.array)]
+
+    def _resize(self, capacity: int) -> None:
+        values = self._values()
+        self.array = values + array.array('i', [0]) * (capacity - self.n)
+        self.head = 0
+
+    def _shift(self, start: int, stop: int, step: int) -> None:
+        """Moves the elements at indexes start to stop - 1 by step, 1 or -1."""
+        count = stop - start
+        if count <= 0:
+            return
+        capacity = len(self.array)
+        a = self.array
+        # copy in runs that wrap around in neither place, at most 3, in the
+        # order that reads every element before it is overwritten
+        if step < 0:
+            while count:
+                src = (self.head + start) % capacity
+                dst = (src - 1) % capacity
+                run = min(count, capacity - src, capacity - dst)
+                a[dst:dst + run] = a[src:src + run]
+                start += run
+                count -= run
+        else:
+            while count:
+                src = (self.head + stop - 1) % capacity + 1  # end of the run
+                dst = src % capacity + 1
+                run = min(count, src, dst)
+                a[dst - run:dst] = a[src - run:src]
+                stop -= run
+                count -= run
+
+class BlockedList:
+    """A list stored as a sequence of blocks, each an array('i') of up to
+    2 * block elements, where block is kept near sqrt(n).
+
+    An index is found by walking the block lengths, and the block holding it
+    is shifted with slice assignment, so insert, delete and get take
+    O(n / block + block) = O(sqrt(n)) time. A block that grows past
+    2 * block is split in two, and one that shrinks is merged with the next
+    one when they fit in block elements together. Whenever sqrt(n) has
+    doubled or halved since, the blocks are rebuilt to the new size, which
+    is O(1) amortized time per operation.
+    """
+
+    def __init__(self, block: int = 16) -> None:
+        assert block > 0, f'Block size must be positive, not {block}'
+        self.min_block = block                          # smallest block size
+        self.block = block
+        self.blocks = [array.array('i')]
+        self.n = 0                                      # number of elements
+
+    def insert(self, index : int , value) -> None:
+        assert 0 <= index <= self.n, f'Cannot insert at index {index} in list of size {self.n}'
+        k, i = self._find(index, True)
+        block = self.blocks[k]
+        block.insert(i, value)
+        if len(block) > 2 * self.block:                 # too long, split in two
+            half = len(block) // 2
+            self.blocks[k:k + 1] = [block[:half], block[half:]]
+        self.n += 1
+        self._rebalance()
+
+    def delete(self, index : int) -> None:
+        assert 0 <= index < self.n, f'Cannot delete index {index} from list of size {self.n}'
+        k, i = self._find(index)
+        block = self.blocks[k]
+        del block[i]
+        if k + 1 < len(self.blocks) and len(block) + len(self.blocks[k + 1]) <= self.block:
+            block.extend(self.blocks.pop(k + 1))        # merge with the next block
+        if not block and len(self.blocks) > 1:
+            del self.blocks[k]
+        self.n -= 1
+        self._rebalance()
+
+    def get(self, index : int):
+        assert 0 <= index < self.n, f'Getting invalid index {index} from list of size {self.n}'
+        k, i = self._find(index)
+        return self.blocks[k][i]
+
+    def size(self) -> int:
+        return self.n
+
+    def display(self) -> list:
+        return [value for block in self.blocks for value in block]
+
+    def _rebalance(self) -> None:
+        """Rebuilds the blocks if sqrt(n) is no longer within a factor of 2
+        of the block size.
+        """
+        target = max(self.min_block, math.isqrt(self.n))
+        if self.block // 2 < target < 2 * self.block:
+            return
+        values = array.array('i')
+        for block in self.blocks:
+            values.extend(block)
+        self.block = target
+        self.blocks = [values[k:k + target] for k in range(0, len(values), target)]\
+            or [array.array('i')]
+
+    def _find(self, index: int, end: bool = False) -> (int, int):
+        """Returns the block holding index and the index within that block.
+
+        If end is True, index may be the size of the list, which is placed at
+        the end of the last block.
+        """
+        for k, block in enumerate(self.blocks):
+            if index < len(block):
+                return k, index
+            index -= len(block)
+        assert end and index == 0, 'Index out of range'
+        return len(self.blocks) - 1, len(self.blocks[-1])
 
 class Node:                                             # required for linkedlist
 
     def __init__(self, data : int) -> None:
         self.data = data
         self.next = None
+        self.prev = None
 
 class LinkedList:
 
     def __init__(self) -> None:
-        # head : pointing to start of list, initialized to none as list is empty initially
+        # head, tail : the first and last nodes, none as list is empty initially
         self.head = None
+        self.tail = None
+        self.n = 0                                      # number of nodes
+        # cursor : the node last reached and its index, so nearby indexes are reached from it
+        self.cursor = None
+        self.cursor_index = 0
 
     def insert(self, index : int , value : int) -> None:
+        assert index >= 0, f'Cannot insert at index {index}'
         node = Node(value)                              # create a new node using Node class
+        index = min(index, self.n)                      # past the end adds at the end, as before
 
-        if index == 0:                                  # if index is 0, that means add at the start of the list
-            node.next = self.head
-            self.head = node
-        else:                                           
-            i = self.head                               # if not empty, traverse through the list to find the tail
-            count = 0
-            while count < index-1 and i.next != None:
-                i = i.next    
-                count += 1
-            node.next = i.next
-            i.next = node                               # assign the node to the tail of the list
+        if index == self.n:                             # add after the tail
+            node.prev = self.tail
+            if self.tail is None:
+                self.head = node
+            else:
+                self.tail.next = node
+            self.tail = node
+        else:                                           # add before the node at index
+            after = self._node(index)
+            node.next = after
+            node.prev = after.prev
+            if after.prev is None:
+                self.head = node
+            else:
+                after.prev.next = node
+            after.prev = node
+        self.n += 1
+        self.cursor, self.cursor_index = node, index
 
     def delete(self, index : int) -> None:
-        if index == 0:
-            self.head = self.head.next                  # if you remove the head, the next node is assigned as the new head
+        node = self._node(index)
+        if node.prev is None:                           # if you remove the head, the next node is the new head
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:                           # likewise for the tail
+            self.tail = node.prev
         else:
-            i = self.head                               
-            count = 0
-            while count < index - 1 and i.next != None: # traverse through the list to find the index
-                i = i.next
-                count += 1
-            i.next = i.next.next                        # update the next pointer  
+            node.next.prev = node.prev
+        self.n -= 1
+        if node.next is not None:                       # the cursor moves to a neighbour
+            self.cursor, self.cursor_index = node.next, index
+        else:
+            self.cursor, self.cursor_index = node.prev, index - 1
 
     def get(self, index : int):
-        i = self.head
-        count = 0
-        while count < index and i != None:              # traverse through the list to find the index
-            i = i.next
-            count += 1
-        return i.data                                   # return data of node at that index
+        return self._node(index).data                   # return data of node at that index
 
     def size(self) -> int:
-        count = 0
-        i = self.head
-        while i.next != None:                           # traverse to find end of list
-            count += 1
-            i = i.next
-        count += 1    
-        return count                                    # since the last node is not being counted, we return the count+1
+        return self.n
 
     def display(self) -> str:
         val = []
@@ -126,36 +300,65 @@ class LinkedList:
             i = i.next
         return val                                      # return val list ie a list of values from linkedlist
 
+    def _node(self, index : int) -> Node:
+        assert 0 <= index < self.n, f'Invalid index {index} for list of size {self.n}'
+        # start from whichever of the head, the tail and the cursor is closest to index
+        node, i = self.head, 0
+        if self.n - 1 - index < index:
+            node, i = self.tail, self.n - 1
+        if self.cursor is not None and abs(self.cursor_index - index) < abs(i - index):
+            node, i = self.cursor, self.cursor_index
+        while i < index:                                # walk forwards or backwards to index
+            node = node.next
+            i += 1
+        while i > index:
+            node = node.prev
+            i -= 1
+        self.cursor, self.cursor_index = node, index
+        return node
+
+# the list to use for each data structure header, LinkedList for any other
+BACKENDS = {"array": DynamicArrayList, "deque": ArrayDeque, "blocked": BlockedList}
+
+# size of the output buffer, so writes reach the file in large chunks
+OUT_BUFFER = 1 << 20
+
+def replay(ds, operations, out) -> None:
+    """
+    Performs the operations on the list ds, writing results to out as they are produced.
+
+    Lines are read one at a time and dispatched through a table built once, so any number of
+    operations run in constant memory. Blank lines and unknown operations are skipped.
+
+    :param ds: the list to operate on, e.g. a LinkedList
+    :param operations: an iterable of operation lines, e.g. an open file
+    :param out: a file-like object with a write method
+    """
+    write = out.write
+    commands = {
+        "insert": lambda op: ds.insert(int(op[1]), int(op[2])),
+        "delete": lambda op: ds.delete(int(op[1])),
+        "get": lambda op: write("%s\n" % ds.get(int(op[1]))),
+        "size": lambda op: write("%s\n" % ds.size()),
+        "display": lambda op: write("%s\n" % ds.display()),
+    }
+    skip = lambda op: None
+    for line in operations:
+        op = line.split()
+        if op:
+            commands.get(op[0], skip)(op)
+
 def load(file_path, out_file):
     """
-    Loads and performs the operations specified in the input file on either a dynamic array list or a linked list.
+    Loads and performs the operations specified in the input file on the list named by its first line,
+    see BACKENDS. The input is streamed and results are written as they are produced, see replay().
 
     :param file_path: the path of the input file
     :type file_path: str
     :param out_file: the name of the output file
     :type out_file: str
     """
-    with open(file_path, 'r') as file:
+    with open(file_path, 'r') as file, open(out_file, 'w', buffering=OUT_BUFFER) as f:
         data_structure = file.readline().strip()
-        operations = file.readlines()
-        out = []
-        if data_structure == "array":
-            ds = DynamicArrayList()
-        else:
-            ds = LinkedList()
-        for op in operations:
-            op = op.strip().split()
-            if op[0] == "delete":
-                ds.delete(int(op[1]))
-            elif op[0] == "get":
-                out.append(ds.get(int(op[1])))
-            elif op[0] == "size":
-                out.append(ds.size())
-            elif op[0] == "display":
-                out.append(ds.display())
-            elif op[0] == "insert":
-                ds.insert(int(op[1]), int(op[2]))
-            
-        with open(out_file, 'w') as f:
-            for item in out:
-                f.write("%s\n" % item)
+        ds = BACKENDS.get(data_structure, LinkedList)()
+        replay(ds, file, f)
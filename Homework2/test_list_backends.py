@@ -0,0 +1,159 @@
+import io
+import math
+import os
+import pytest
+import random
+import sys
+sys.path.append("./src")
+from listadt import load, replay, ArrayDeque, BlockedList, DynamicArrayList, LinkedList
+
+
+@pytest.mark.parametrize('name', ['', '1'])
+def test_reference_files(name, tmp_path):
+    out = tmp_path / 'output.txt'
+    load(os.path.join('data', f'input{name}.txt'), out)
+    with open(os.path.join('data', f'output{name}.txt')) as f:
+        expected = f.read().strip()
+    assert out.read_text().strip() == expected, \
+        f'FAIL: load data/input{name}.txt differs from data/output{name}.txt'
+
+
+@pytest.mark.parametrize('backend', [LinkedList, ArrayDeque, BlockedList, lambda: BlockedList(4)])
+@pytest.mark.parametrize('seed', range(10))
+def test_backend_matches_list(backend, seed):
+    rnd = random.Random(seed)
+    ds, values = backend(), []
+    for _ in range(500):
+        if not values or rnd.random() < 0.6:
+            i = rnd.choice([0, len(values), rnd.randint(0, len(values))])
+            v = rnd.randint(-5, 99)
+            ds.insert(i, v)
+            values.insert(i, v)
+        else:
+            i = rnd.choice([0, len(values) - 1, rnd.randrange(len(values))])
+            ds.delete(i)
+            del values[i]
+        if values:
+            i = rnd.randrange(len(values))
+            assert ds.get(i) == values[i], f'FAIL: get({i}) is not {values[i]}'
+        assert ds.size() == len(values), f'FAIL: size is not {len(values)}'
+        assert ds.display() == values, f'FAIL: display {ds.display()} is not {values}'
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_array_matches_linked(seed):
+    rnd = random.Random(seed)
+    array, linked, values = DynamicArrayList(), LinkedList(), []
+    for _ in range(300):
+        if not values or rnd.random() < 0.6:
+            i, v = rnd.randint(0, len(values)), rnd.randint(-5, 99)
+            array.insert(i, v)
+            linked.insert(i, v)
+            values.insert(i, v)
+        else:
+            i = rnd.randrange(len(values))
+            array.delete(i)
+            linked.delete(i)
+            del values[i]
+        if values:
+            i = rnd.randrange(len(values))
+            assert array.get(i) == linked.get(i) == values[i], \
+                f'FAIL: get({i}) differs from {values[i]}'
+            assert array.size() == linked.size() == len(values), \
+                f'FAIL: size differs from {len(values)}'
+        assert array.display()[:len(values)] == values, \
+            f'FAIL: array display {array.display()} does not start with {values}'
+
+
+def test_array_capacity():
+    array = DynamicArrayList()
+    capacities = []
+    for i in range(9):
+        array.insert(i, -1)
+        capacities.append(len(array.display()))
+    assert capacities == [1, 2, 4, 4, 8, 8, 8, 8, 16], \
+        f'FAIL: capacities {capacities} do not double'
+    assert array.size() == 9 and array.get(8) == -1, 'FAIL: -1 is not stored'
+    while array.size():
+        array.delete(0)
+    assert array.display() == [], 'FAIL: empty array not shrunk'
+    array.insert(0, 7)
+    assert array.display() == [7] and array.size() == 1, \
+        'FAIL: cannot insert after emptying'
+
+
+def test_array_growth_factors():
+    array = DynamicArrayList(growth=1.5, shrink=4)
+    for i in range(10):
+        array.insert(0, i)
+    assert array.display()[:10] == list(range(9, -1, -1)), \
+        f'FAIL: wrong contents {array.display()}'
+    assert len(array.display()) == 13, \
+        f'FAIL: capacity {len(array.display())} does not grow by 1.5'
+
+
+@pytest.mark.parametrize('header', ['deque', 'blocked'])
+def test_backend_header(header, tmp_path):
+    with open(os.path.join('data', 'input.txt')) as f:
+        operations = f.read().split('\n', 1)[1]
+    src, out = tmp_path / 'input.txt', tmp_path / 'output.txt'
+    src.write_text(f'{header}\n{operations}')
+    load(src, out)
+    with open(os.path.join('data', 'output.txt')) as f:
+        expected = f.read().strip()
+    assert out.read_text().strip() == expected, \
+        f'FAIL: {header} output differs from the linked list output'
+
+
+def test_replay_streams():
+    out = io.StringIO()
+
+    def operations():
+        yield 'insert 0 4\n'
+        yield 'insert 1 -1 \n'
+        yield '\n'
+        yield 'get 1\n'
+        assert out.getvalue() == '-1\n', 'FAIL: get not written as it is performed'
+        yield 'unknown 3\n'
+        yield 'display'
+
+    replay(LinkedList(), operations(), out)
+    assert out.getvalue() == '-1\n[4, -1]\n', f'FAIL: wrong output {out.getvalue()!r}'
+
+
+@pytest.mark.parametrize('backend', [LinkedList, DynamicArrayList, ArrayDeque, BlockedList])
+def test_empty_size(backend):
+    ds = backend()
+    assert ds.size() == 0, 'FAIL: size of an empty list is not 0'
+    ds.insert(0, 3)
+    ds.delete(0)
+    assert ds.size() == 0, 'FAIL: size of an emptied list is not 0'
+
+
+def test_linked_cursor():
+    linked = LinkedList()
+    for i in range(100):
+        linked.insert(i, i)
+    linked.insert(200, 100)
+    assert linked.get(50) == 50 and linked.cursor_index == 50, 'FAIL: cursor not kept'
+    assert [linked.get(i) for i in range(51, 40, -1)] == list(range(51, 40, -1)), \
+        'FAIL: walking backwards from the cursor'
+    linked.delete(41)
+    assert linked.get(41) == 42 and linked.cursor.prev.data == 40, 'FAIL: delete at the cursor'
+    linked.delete(linked.size() - 1)
+    assert linked.tail.data == 99 and linked.display()[-2:] == [98, 99], 'FAIL: tail not kept'
+
+
+def test_blocked_sqrt_blocks():
+    rnd = random.Random(0)
+    blocked = BlockedList()
+    for k in range(20000):
+        blocked.insert(rnd.randint(0, k), k)
+        if k % 1000 == 999:
+            root = math.isqrt(blocked.size())
+            assert root // 3 <= len(blocked.blocks) <= 3 * root, \
+                f'FAIL: {len(blocked.blocks)} blocks for {blocked.size()} elements'
+    while blocked.size() > 100:
+        blocked.delete(rnd.randrange(blocked.size()))
+    assert blocked.block <= 2 * max(blocked.min_block, math.isqrt(100)), \
+        f'FAIL: block size {blocked.block} not shrunk'